@@ -11,8 +11,8 @@ from six import string_types, with_metaclass
 from fuzzywuzzy import process
 
 from . import filesystem
+from . import parallel
 from . import _AGGTREELIMBS, _AGGLIMBS
-from .collections import Bundle
 from .limbs import Tags
 
 
@@ -279,6 +279,65 @@ class AggTags(AggLimb):
         return tuple(matches)
 
 
+class GroupBy(dict):
+    """Bundles of members by category values, as given by
+    :meth:`AggCategories.groupby`.
+
+    """
+    def map(self, function, processes=1, **kwargs):
+        """Apply a function to each member of each group, perhaps in
+        parallel.
+
+        This works as :meth:`Bundle.map` on each group, but with more than
+        one worker process or thread, all groups share one pool of them.
+
+        Parameters
+        ----------
+        function : function
+            Function to apply to each member; must take a single Treant
+            instance as its first argument.
+        processes : int
+            How many processes to use.
+        kwargs : keyword arguments
+            Passed on to :meth:`Bundle.map`.
+
+        Returns
+        -------
+        dict
+            Results of :meth:`Bundle.map` for each group, by group key.
+
+        """
+        backend = kwargs.get('backend', 'processes')
+        workers = kwargs.get('workers') or processes
+        if (workers > 1 and backend in ('processes', 'threads') and
+                kwargs.get('pool') is None):
+            with parallel.WorkerPool(
+                    workers, threads=(backend == 'threads')) as pool:
+                kwargs['pool'] = pool
+                return {key: bundle.map(function, **kwargs)
+                        for key, bundle in self.items()}
+
+        return {key: bundle.map(function, processes=processes, **kwargs)
+                for key, bundle in self.items()}
+
+    def agg(self, function):
+        """Reduce each group to a single value.
+
+        Parameters
+        ----------
+        function : function
+            Function to apply to each group; must take a Bundle as its only
+            argument.
+
+        Returns
+        -------
+        dict
+            Result of `function` for each group, by group key.
+
+        """
+        return {key: function(bundle) for key, bundle in self.items()}
+
+
 class AggCategories(AggLimb):
     """Interface to categories.
 
@@ -318,6 +377,41 @@ class AggCategories(AggLimb):
         else:
             raise TypeError("Can only set with categories or dict")
 
+    def _snapshot(self):
+        """Get the categories of each member, reading each member's state
+        once.
+
+        Returns
+        -------
+        list
+            Dict of categories for each member, in member order.
+
+        """
+        return [member.categories._dict()
+                for member in self._collection._list()]
+
+    @staticmethod
+    def _values(snapshot, key):
+        """Get values for a category from a snapshot, with ``None`` for
+        members without it.
+
+        """
+        return [categories.get(key) for categories in snapshot]
+
+    @staticmethod
+    def _keys(snapshot, scope='all'):
+        """Get the category keys present among members in a snapshot.
+
+        """
+        keys = [set(categories) for categories in snapshot]
+
+        if scope == 'all':
+            return set.intersection(*keys)
+        elif scope == 'any':
+            return set.union(*keys)
+        else:
+            raise ValueError("Scope must be either 'all' or 'any'")
+
     def __getitem__(self, keys):
         """Get values for a given key, list of keys, or set of keys.
 
@@ -350,19 +444,14 @@ class AggCategories(AggLimb):
         if keys is None:
             return None
 
-        members = self._collection
         if isinstance(keys, (int, float, string_types, bool)):
-            k = keys
-            return [m.categories[k] if k in m.categories else None
-                    for m in members]
+            return self._values(self._snapshot(), keys)
         elif isinstance(keys, list):
-            return [[m.categories[k] if k in m.categories else None
-                    for m in members]
-                    for k in keys]
+            snapshot = self._snapshot()
+            return [self._values(snapshot, k) for k in keys]
         elif isinstance(keys, set):
-            return {k: [m.categories[k] if k in m.categories else None
-                    for m in members]
-                    for k in keys}
+            snapshot = self._snapshot()
+            return {k: self._values(snapshot, k) for k in keys}
         else:
             raise TypeError("Key must be a string, list of strings, or set"
                             " of strings.")
@@ -429,12 +518,9 @@ class AggCategories(AggLimb):
         dict
             All unique Categories among members.
         """
-        keys = [set(member.categories.keys()) for member in self._collection]
-        keys = set.union(*keys)
-
-        return {k: [m.categories[k] if k in m.categories else None
-                for m in self._collection]
-                for k in keys}
+        snapshot = self._snapshot()
+        return {k: self._values(snapshot, k)
+                for k in self._keys(snapshot, 'any')}
 
     @property
     def all(self):
@@ -445,12 +531,9 @@ class AggCategories(AggLimb):
         dict
             Categories common to all members.
         """
-        keys = [set(member.categories.keys()) for member in self._collection]
-        keys = set.intersection(*keys)
-
-        return {k: [m.categories[k] if k in m.categories else None
-                for m in self._collection]
-                for k in keys}
+        snapshot = self._snapshot()
+        return {k: self._values(snapshot, k)
+                for k in self._keys(snapshot, 'all')}
 
     def add(self, categorydict=None, **categories):
         """Add any number of categories to each Treant in collection.
@@ -515,16 +598,7 @@ class AggCategories(AggLimb):
             Present keys.
 
         """
-        keys = [set(member.categories.keys()) for member in self._collection]
-
-        if scope == 'all':
-            out = set.intersection(*keys)
-        elif scope == 'any':
-            out = set.union(*keys)
-        else:
-            raise ValueError("Scope must be either 'all' or 'any'")
-
-        return list(out)
+        return list(self._keys(self._snapshot(), scope))
 
     def values(self, scope='all'):
         """Get the category values for all Treants in collection.
@@ -544,8 +618,9 @@ class AggCategories(AggLimb):
             the same order as the keys from ``AggCategories.keys``.
 
         """
-        keys = self.keys(scope=scope)
-        return self[keys]
+        snapshot = self._snapshot()
+        return [self._values(snapshot, k)
+                for k in self._keys(snapshot, scope)]
 
     def groupby(self, keys):
         """Return groupings of Treants based on values of Categories.
@@ -563,6 +638,9 @@ class AggCategories(AggLimb):
         each Bundle will have all of the category values specified by the tuple
         for that Bundle's key.
 
+        Category values are read once per member, and each group keeps the
+        members' order in the collection.
+
         Parameters
         ----------
         keys : str, list, set
@@ -570,37 +648,36 @@ class AggCategories(AggLimb):
 
         Returns
         -------
-        dict
-            Bundles of members by category values.
+        GroupBy
+            Dict of Bundles of members by category values; see
+            :meth:`GroupBy.map` and :meth:`GroupBy.agg` for working on all
+            groups at once.
         """
         if keys is None:
             return None
 
-        members = self._collection
-        if isinstance(keys, (string_types)):
-            catvals = members.categories[keys]
-            groupkeys = [v for v in catvals if v is not None]
-            groups = {k: Bundle() for k in groupkeys}
-
-            k = keys
-            gen = ((m, m.categories[k]) for m in members if
-                   k in m.categories and m.categories[k] in groupkeys)
-            for m, catval in gen:
-                groups[catval].add(m)
-
+        if isinstance(keys, string_types):
+            single = True
+            keys = [keys]
         elif isinstance(keys, (list, set)):
+            single = False
             keys = sorted(keys)
-            catvals = list(zip(*members.categories[keys]))
-            groupkeys = [v for v in catvals if None not in v]
-            groups = {k: Bundle() for k in groupkeys}
-
-            gen = ((i, m) for i, m in enumerate(members) if
-                   set(keys) <= set(m.categories) and
-                   tuple([m.categories[k] for k in keys]) in groupkeys)
-            for i, m in gen:
-                groups[catvals[i]].add(m)
-
         else:
             raise TypeError("Keys must be a string or a list or set of"
                             " strings")
+
+        # one pass over the members' categories, hashing each into its group
+        members = self._collection
+        grouped = dict()
+        for categories, record in zip(self._snapshot(),
+                                      members._get_member_records()):
+            try:
+                value = tuple(categories[k] for k in keys)
+            except KeyError:
+                continue
+            grouped.setdefault(value[0] if single else value,
+                               []).append(record)
+
+        groups = GroupBy((value, members._bundle(records))
+                         for value, records in grouped.items())
         return groups
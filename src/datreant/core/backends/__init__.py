@@ -8,6 +8,6 @@ datreant.backends --- low-level file backends
 =============================================
 
 """
-from .core import File, FileSerial
+from .core import File, FileSerial, FileAtomic
 
-__all__ = ['File', 'FileSerial']
+__all__ = ['File', 'FileSerial', 'FileAtomic']
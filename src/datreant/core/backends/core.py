@@ -4,6 +4,7 @@
 
 import os
 import sys
+import shutil
 import fcntl
 import warnings
 import json
@@ -39,18 +40,8 @@ class File(object):
         proxy = "." + os.path.basename(self.filename) + ".proxy"
         self.proxy = os.path.join(os.path.dirname(self.filename), proxy)
 
-        # we create the file if it doesn't exist; if it does, an exception is
-        # raised and we catch it; this is necessary to ensure the file exists
-        # so we can use it for locks
-        try:
-            fd = os.open(self.proxy, os.O_CREAT | os.O_EXCL)
-            os.close(fd)
-        except OSError as e:
-            # if we get the error precisely because the file exists, continue
-            if e.errno == 17:
-                pass
-            else:
-                raise
+        # the proxy file itself is created on first lock, so that making a
+        # File object does no I/O
 
     def get_location(self):
         """Get File basedir.
@@ -130,13 +121,13 @@ class File(object):
         to it.
 
         """
-        self.fd = os.open(self.proxy, os.O_RDONLY)
+        self.fd = os.open(self.proxy, os.O_RDONLY | os.O_CREAT)
 
     def _open_fd_rw(self):
         """Open read-write file descriptor for application of advisory locks.
 
         """
-        self.fd = os.open(self.proxy, os.O_RDWR)
+        self.fd = os.open(self.proxy, os.O_RDWR | os.O_CREAT)
 
     def _close_fd(self):
         """Close file descriptor used for application of advisory locks.
@@ -234,6 +225,11 @@ class File(object):
         self.fdlock = None
         self._close_fd()
 
+    @property
+    def _writebuffer(self):
+        wbuffer = ".{}.buffer".format(os.path.basename(self.filename))
+        return os.path.join(os.path.dirname(self.filename), wbuffer)
+
     def delete(self):
         """Delete this file and its proxy file.
 
@@ -249,11 +245,6 @@ class FileSerial(File):
     """File object base class for serialization formats, such as JSON.
 
     """
-    @property
-    def _writebuffer(self):
-        wbuffer = ".{}.buffer".format(os.path.basename(self.filename))
-        return os.path.join(os.path.dirname(self.filename), wbuffer)
-
     def _open_file_r(self):
         return open(self.filename, 'r')
 
@@ -330,6 +321,49 @@ class FileSerial(File):
         raise NotImplementedError
 
 
+class FileAtomic(File):
+    """File object for replacing the full contents of a file atomically.
+
+    Contents are written to a buffer file while an exclusive lock is held,
+    and the buffer is then renamed over the file. Readers therefore see either
+    the old contents or the new, never a partial write, and concurrent
+    writers are serialized.
+
+    """
+    @contextmanager
+    def write(self, mode='w'):
+        """Context manager giving a file object to write new contents to.
+
+        The contents replace those of the file only if the block exits without
+        an exception; otherwise the buffer is discarded.
+
+        :Arguments:
+            *mode*
+                mode to open the buffer file with; 'w' or 'wb'
+
+        """
+        self._apply_exclusive_lock()
+        try:
+            self.handle = open(self._writebuffer, mode)
+            committed = False
+            try:
+                yield self.handle
+                self.handle.flush()
+                os.fsync(self.handle.fileno())
+                committed = True
+            finally:
+                self.handle.close()
+                if committed:
+                    # the buffer is a new file; keep the file's permissions
+                    if os.path.exists(self.filename):
+                        shutil.copymode(self.filename, self._writebuffer)
+                    os.rename(self._writebuffer, self.filename)
+                else:
+                    os.remove(self._writebuffer)
+        finally:
+            self._release_lock()
+
+
 class JSONFile(FileSerial):
     def _deserialize(self, handle):
         return json.load(handle)
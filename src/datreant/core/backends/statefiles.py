@@ -51,3 +51,20 @@ class TreantFile(JSONFile):
     """
     def _init_state(self):
         self._state = dict()
+
+
+class HashCacheFile(JSONFile):
+    """Content digest cache for the files within a Tree.
+
+    For each hashing algorithm, maps the path of each file relative to the
+    Tree to a list giving the file's inode, size, and modification time when
+    it was hashed, followed by its digest. A cached digest is only valid while
+    the first three still match the file.
+
+    :Arguments:
+        *filename*
+            path to file
+
+    """
+    def _init_state(self):
+        self._state = dict()
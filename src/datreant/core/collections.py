@@ -9,21 +9,303 @@ conveniences for Trees and Leaves.
 from __future__ import absolute_import
 
 import os
+import json
 import functools
-from collections import namedtuple, defaultdict
+import heapq
+from uuid import uuid4
+from collections import namedtuple, defaultdict, OrderedDict, deque
+from weakref import WeakValueDictionary
 
 import multiprocessing as mp
 import glob
 import fnmatch
 
+try:
+    from collections.abc import MutableMapping
+except ImportError:
+    from collections import MutableMapping
+
 from six import string_types
 from six.moves import zip
 
 from . import filesystem
-from . import _AGGLIMBS, _AGGTREELIMBS
+from . import parallel
+from . import _TREANTS, _AGGLIMBS, _AGGTREELIMBS
 from .trees import Tree, Leaf
 from .manipulators import discover
 
+# default number of loaded members a Bundle keeps
+CACHESIZE = 1024
+
+CacheInfo = namedtuple('CacheInfo',
+                       ['hits', 'misses', 'evictions', 'maxsize', 'currsize'])
+
+
+def _diff_member(treant, root, hidden=False):
+    """Compare a Treant's Tree to that of the same name under `root`; used by
+    :meth:`Bundle.diff`.
+
+    """
+    return treant.tree.diff(os.path.join(root, treant.name), hidden=hidden)
+
+
+def _write_leaf(leaf, contents):
+    """Write contents to a Leaf; used by :meth:`View.write_many`.
+
+    """
+    leaf.write(contents)
+
+
+class MemberCache(MutableMapping):
+    """Cache of loaded member Treants, keyed by uuid.
+
+    The cache holds at most `maxsize` Treants, evicting the least recently
+    used beyond that. In weak mode it instead holds Treants only for as long
+    as something else refers to them. Lookups through :meth:`get` count as
+    hits or misses; see :meth:`cache_info`.
+
+    Parameters
+    ----------
+    maxsize : int
+        Most Treants to hold; if ``None``, there is no limit.
+    weak : bool
+        If ``True``, hold Treants by weak reference only; `maxsize` does not
+        apply.
+
+    """
+    def __init__(self, maxsize=CACHESIZE, weak=False):
+        self._weak = weak
+        if weak:
+            self._store = WeakValueDictionary()
+            self._maxsize = None
+        else:
+            self._store = OrderedDict()
+            self._maxsize = maxsize
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __repr__(self):
+        return "<MemberCache({})>".format(self.cache_info())
+
+    def __getitem__(self, uuid):
+        return self._store[uuid]
+
+    def __setitem__(self, uuid, treant):
+        # members that could not be found aren't kept
+        if treant is None:
+            self._store.pop(uuid, None)
+            return
+
+        if not self._weak:
+            self._store.pop(uuid, None)
+        self._store[uuid] = treant
+        self._trim()
+
+    def __delitem__(self, uuid):
+        del self._store[uuid]
+
+    def __iter__(self):
+        return iter(list(self._store))
+
+    def __len__(self):
+        return len(self._store)
+
+    def get(self, uuid, default=None):
+        """Get a Treant by uuid, marking it as most recently used.
+
+        """
+        try:
+            treant = self._store[uuid]
+        except KeyError:
+            self.misses += 1
+            return default
+
+        # move to most recently used; tolerant of other threads doing the same
+        if not self._weak:
+            self._store.pop(uuid, None)
+            self._store[uuid] = treant
+
+        self.hits += 1
+        return treant
+
+    def clear(self):
+        self._store.clear()
+
+    @property
+    def weak(self):
+        """Whether Treants are held by weak reference only.
+
+        """
+        return self._weak
+
+    @property
+    def maxsize(self):
+        """Most Treants to hold; ``None`` if there is no limit.
+
+        Lowering this evicts the least recently used Treants right away.
+
+        """
+        return self._maxsize
+
+    @maxsize.setter
+    def maxsize(self, value):
+        if self._weak and value is not None:
+            raise ValueError("A weak cache has no maximum size")
+        self._maxsize = value
+        self._trim()
+
+    def cache_info(self):
+        """Report hits, misses, evictions and size.
+
+        Returns
+        -------
+        info : CacheInfo
+            namedtuple of (hits, misses, evictions, maxsize, currsize)
+
+        """
+        return CacheInfo(self.hits, self.misses, self.evictions,
+                         self._maxsize, len(self._store))
+
+    def _trim(self):
+        if self._maxsize is None:
+            return
+        while len(self._store) > self._maxsize:
+            self._store.popitem(last=False)
+            self.evictions += 1
+
+
+@functools.total_ordering
+class TreantHandle(object):
+    """Lightweight stand-in for a Treant that is a member of a Bundle.
+
+    A handle holds only what a Bundle records for each member: its uuid,
+    treanttype and last known location. It becomes a full Treant on first
+    access of anything else, such as a limb; that Treant is then kept for
+    any later access.
+
+    Parameters
+    ----------
+    uuid : str
+        uuid of the Treant
+    treanttype : str
+        type of the Treant
+    abspath : str
+        last known absolute path of the Treant's directory
+    bundle : Bundle
+        Bundle to use for finding the Treant if it has moved
+
+    """
+    __slots__ = ('uuid', 'treanttype', '_abspath', '_bundle', '_treant')
+
+    def __init__(self, uuid, treanttype, abspath, bundle=None):
+        object.__setattr__(self, 'uuid', uuid)
+        object.__setattr__(self, 'treanttype', treanttype)
+        object.__setattr__(self, '_abspath', abspath.rstrip(os.sep))
+        object.__setattr__(self, '_bundle', bundle)
+        object.__setattr__(self, '_treant', None)
+
+    def __repr__(self):
+        return "<{}: '{}'>".format(self.treanttype, self.name)
+
+    # special methods are looked up on the class, not through __getattr__,
+    # so those of Treants are forwarded here
+    def __str__(self):
+        return str(self._resolve())
+
+    def __getitem__(self, path):
+        return self._resolve()[path]
+
+    def __contains__(self, item):
+        return item in self._resolve()
+
+    def __add__(self, other):
+        return self._resolve() + other
+
+    def __radd__(self, other):
+        return other + self._resolve()
+
+    def __getattr__(self, attr):
+        if attr.startswith('__') or attr in TreantHandle.__slots__:
+            raise AttributeError(attr)
+        return getattr(self._resolve(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._resolve(), attr, value)
+
+    def __reduce__(self):
+        return (TreantHandle, (self.uuid, self.treanttype, self.abspath))
+
+    def __hash__(self):
+        return hash(self.uuid)
+
+    def __eq__(self, other):
+        try:
+            return (self.name + self.uuid) == (other.name + other.uuid)
+        except AttributeError:
+            return NotImplemented
+
+    def __lt__(self, other):
+        try:
+            return (self.name + self.uuid) < (other.name + other.uuid)
+        except AttributeError:
+            return NotImplemented
+
+    @property
+    def name(self):
+        """The name of the Treant.
+
+        """
+        if self._treant is not None:
+            return self._treant.name
+        return os.path.basename(self._abspath)
+
+    @property
+    def abspath(self):
+        """Absolute path of the Treant's directory.
+
+        """
+        if self._treant is not None:
+            return self._treant.abspath
+        return self._abspath + os.sep
+
+    @property
+    def filepath(self):
+        """Absolute path to the Treant's state file.
+
+        """
+        if self._treant is not None:
+            return self._treant.filepath
+        return os.path.join(self._abspath,
+                            filesystem.statefilename(self.treanttype,
+                                                     self.uuid))
+
+    def _resolve(self):
+        """Get the full Treant this handle stands in for.
+
+        """
+        if self._treant is None:
+            treant = None
+            bundle = self._bundle
+            if bundle is not None:
+                member = bundle._get_member(self.uuid)
+                if member is not None:
+                    treant = bundle._fetch([member])[0]
+
+            # not (or no longer) in a Bundle; load from last known location
+            if treant is None:
+                filepath = self.filepath
+                if not os.path.exists(filepath):
+                    raise IOError("Could not find member (uuid: {}) at "
+                                  "'{}'".format(self.uuid, filepath))
+                treant = _TREANTS[self.treanttype](filepath)
+
+            object.__setattr__(self, '_treant', treant)
+            object.__setattr__(self, '_bundle', None)
+
+        return self._treant
+
 
 @functools.total_ordering
 class CollectionMixin(object):
@@ -56,6 +338,341 @@ class CollectionMixin(object):
         """
         return self._classagglimbs | self._agglimbs
 
+    def map(self, function, processes=1, errors='raise', checkpoint=None,
+            shared=None, monitor=None, chunksize=None, pool=None,
+            backend='processes', workers=None, **kwargs):
+        """Apply a function to each member, perhaps in parallel.
+
+        A pool of processes is created for `processes` > 1; for example,
+        with 40 members and ``processes=4``, 4 processes will be created,
+        each working on a chunk of members at any given time. When each
+        process completes work on a chunk, it grabs another, until no members
+        remain. The pool is closed when done; to keep worker processes
+        between calls, give a `pool` instead.
+
+        For I/O-bound functions, a pool of threads can be used instead with
+        ``backend='threads'``; members are then not pickled. With
+        ``backend='asyncio'``, `function` must be a coroutine function; at
+        most `workers` of its coroutines run at once on an event loop.
+
+        With a `checkpoint`, each member's result is saved beside it as soon
+        as it is done; a later call with the same `checkpoint` loads saved
+        results and only applies the function to the remaining members.
+
+        `kwargs` are passed to the given function when applied to each member
+
+        Parameters
+        ----------
+        function : function
+            Function to apply to each member. Must take only a single member
+            as input, but may take any number of keyword arguments.
+        processes : int
+            How many processes to use. If 1, applies function to each member in
+            member order in serial.
+        errors : {'raise', 'collect', 'skip'}
+            What to do when the function raises for a member. With 'raise',
+            the exception propagates. With 'collect', a
+            :class:`~datreant.core.parallel.MapFailure` is given in place of
+            that member's result; with 'skip', ``None`` is.
+        checkpoint : str
+            Name under which to save each member's result; results must be
+            picklable. See :func:`datreant.core.parallel.checkpoint_path`.
+        shared : dict
+            Large read-only inputs, given to the function as keyword arguments
+            like `kwargs`. Worker processes get them through memory-mapped
+            files written once per call instead of a copy with each task; see
+            :func:`datreant.core.parallel.sharing`.
+        monitor : MapMonitor
+            Receives progress as members are done, and times each member; see
+            :class:`datreant.core.parallel.MapMonitor`.
+        chunksize : int
+            Number of members sent to a worker process at a time. If ``None``,
+            chosen from the number of members and processes.
+        pool : WorkerPool
+            Persistent pool of worker processes or threads to use; `processes`
+            and `backend` are then ignored. See
+            :func:`datreant.core.parallel.get_pool`.
+        backend : {'processes', 'threads', 'asyncio'}
+            How to run the function for many members at once.
+        workers : int
+            How many processes, threads or concurrent coroutines to use;
+            takes the place of `processes` if given.
+
+        Returns
+        -------
+        results : list
+            List giving the result of the function for each member, in member
+            order. If the function returns ``None`` for each member, then only
+            ``None`` is returned instead of a list.
+        """
+        results = list(self.imap(function, processes=processes,
+                                 errors=errors, checkpoint=checkpoint,
+                                 shared=shared, monitor=monitor,
+                                 chunksize=chunksize, pool=pool,
+                                 backend=backend, workers=workers, **kwargs))
+
+        # check if list is all ``None``: if so, we return ``None``
+        if all([(i is None) for i in results]):
+            results = None
+
+        return results
+
+    def imap(self, function, processes=1, errors='raise', checkpoint=None,
+             shared=None, monitor=None, chunksize=None, pool=None,
+             backend='processes', workers=None, ordered=True, **kwargs):
+        """Apply a function to each member, giving results as they are done.
+
+        Works as :meth:`map`, but returns an iterator over the results.
+
+        Parameters
+        ----------
+        ordered : bool
+            If ``True``, give results in member order; if ``False``, give
+            them in the order they are done.
+
+        Returns
+        -------
+        results : iterator
+            Result of the function for each member.
+        """
+        if backend not in ('processes', 'threads', 'asyncio'):
+            raise ValueError("backend must be one of 'processes', 'threads' "
+                             "or 'asyncio'")
+        if errors not in ('raise', 'collect', 'skip'):
+            raise ValueError("errors must be one of 'raise', 'collect' "
+                             "or 'skip'")
+        if workers is None:
+            workers = processes
+
+        # arguments are checked above, right away; the rest runs as the
+        # results are iterated over
+        return self._imap_saved(function, workers, errors, checkpoint,
+                                shared, monitor, chunksize, pool, backend,
+                                ordered, kwargs)
+
+    def _imap_saved(self, function, workers, errors, checkpoint, shared,
+                    monitor, chunksize, pool, backend, ordered, kwargs):
+        """Give results as :meth:`imap`, including those saved at
+        `checkpoint` by an earlier run.
+
+        """
+        # results saved by an earlier run, by member position
+        saved = dict()
+        todo = self
+        if checkpoint is not None:
+            for i, member in enumerate(self):
+                if os.path.exists(parallel.checkpoint_path(member,
+                                                           checkpoint)):
+                    saved[i] = parallel._load_checkpoint(member, checkpoint)
+            if saved:
+                todo = self._subset([i for i in range(len(self))
+                                     if i not in saved])
+
+        if monitor is not None:
+            if pool is not None:
+                nworkers = pool.processes
+            elif backend == 'asyncio' or workers > 1:
+                nworkers = max(workers, 1)
+            else:
+                nworkers = 1
+            monitor._start(len(todo), nworkers)
+
+        results = todo._imap(function, workers, errors, checkpoint, shared,
+                             monitor, chunksize, pool, backend, ordered,
+                             kwargs)
+
+        if not ordered:
+            for i in saved:
+                yield saved[i]
+        for i in range(len(self)):
+            if ordered and i in saved:
+                yield saved[i]
+            elif i not in saved:
+                yield next(results)
+
+        if monitor is not None:
+            monitor._finish()
+
+    def _imap(self, function, workers, errors, checkpoint, shared, monitor,
+              chunksize, pool, backend, ordered, kwargs):
+        # only worker processes need shared inputs written out
+        local = dict(kwargs)
+        local.update(shared or {})
+
+        if backend == 'asyncio' and pool is None:
+            for result in parallel.imap_coroutines(
+                    function, self._list(), workers=workers, ordered=ordered,
+                    errors=errors, checkpoint=checkpoint, monitor=monitor,
+                    **local):
+                yield result
+            return
+
+        if errors != 'raise' or checkpoint is not None:
+            function = parallel._Guarded(function, errors, checkpoint)
+
+        def timed(function):
+            return function if monitor is None else parallel._Timed(function)
+
+        def results(outputs):
+            if monitor is None:
+                return outputs
+            return (record(*output) for output in outputs)
+
+        def record(result, member, seconds):
+            monitor._record(member, seconds)
+            return result
+
+        temporary = False
+        if pool is None:
+            if workers <= 1:
+                function = timed(function)
+                for result in results(function(member, **local)
+                                      for member in self._list()):
+                    yield result
+                return
+
+            pool = parallel.WorkerPool(workers,
+                                       threads=(backend == 'threads'))
+            temporary = True
+
+        imap = pool.imap if ordered else pool.imap_unordered
+        try:
+            if pool.threads:
+                members = self._list()
+                for result in results(imap(timed(function), members,
+                                           chunksize=chunksize or 1,
+                                           **local)):
+                    yield result
+            else:
+                with parallel.sharing(function, shared) as function:
+                    function, members = self._tasks(timed(function))
+                    if chunksize is None:
+                        chunksize = parallel._chunksize(len(members),
+                                                        pool.processes)
+
+                    for result in results(imap(function, members,
+                                               chunksize=chunksize,
+                                               **kwargs)):
+                        yield result
+        finally:
+            if temporary:
+                pool.terminate()
+
+    def mapreduce(self, mapper, reducer, initializer=None, processes=1,
+                  shared=None, chunksize=None, pool=None, tree=False,
+                  **kwargs):
+        """Apply a function to each member and reduce the results to one value.
+
+        The result is that of ``functools.reduce(reducer, map(mapper,
+        members), initializer)``, but with processes > 1 each worker reduces
+        the results for its chunk of members itself, so only one partial
+        result per chunk comes back to this process. Results for members
+        are reduced in member order, so `reducer` needn't be commutative,
+        but must be associative.
+
+        `kwargs` are passed to `mapper` when applied to each member.
+
+        Parameters
+        ----------
+        mapper : function
+            Function to apply to each member. Must take only a single member
+            as input, but may take any number of keyword arguments.
+        reducer : function
+            Function taking two results and giving their combination.
+        initializer : object
+            Value to start the reduction from; if ``None``, the reduction
+            starts from the first member's result.
+        processes : int
+            How many processes to use. If 1, applies `mapper` to each member
+            in member order in serial.
+        shared : dict
+            Large read-only inputs, given to `mapper` as keyword arguments;
+            see :meth:`map`.
+        chunksize : int
+            Number of members each worker reduces at a time. If ``None``,
+            chosen from the number of members and processes.
+        pool : WorkerPool
+            Persistent pool of worker processes or threads to use;
+            `processes` is then ignored.
+        tree : bool
+            If ``True``, also combine partial results pairwise in the workers,
+            in rounds, rather than one after another in this process; useful
+            when `reducer` is expensive.
+
+        Returns
+        -------
+        result : object
+            The reduced result; `initializer` if there are no members.
+        """
+        if not len(self):
+            return initializer
+
+        # only worker processes need shared inputs written out
+        local = dict(kwargs)
+        local.update(shared or {})
+
+        temporary = False
+        if pool is None:
+            if processes <= 1:
+                result = parallel._fold(mapper, reducer, local,
+                                        self._list())
+                if initializer is not None:
+                    result = reducer(initializer, result)
+                return result
+
+            pool = parallel.WorkerPool(processes)
+            temporary = True
+
+        try:
+            if pool.threads:
+                result = self._mapreduce(mapper, reducer, initializer,
+                                         self._list(), chunksize, pool, tree,
+                                         local)
+            else:
+                with parallel.sharing(mapper, shared) as mapper:
+                    mapper, members = self._tasks(mapper)
+                    result = self._mapreduce(mapper, reducer, initializer,
+                                             members, chunksize, pool, tree,
+                                             kwargs)
+        finally:
+            if temporary:
+                pool.terminate()
+
+        return result
+
+    @staticmethod
+    def _mapreduce(mapper, reducer, initializer, members, chunksize, pool,
+                   tree, kwargs):
+        if chunksize is None:
+            chunksize = parallel._chunksize(len(members), pool.processes)
+        chunks = [members[i:i + chunksize]
+                  for i in range(0, len(members), chunksize)]
+
+        partials = pool.imap(
+                functools.partial(parallel._fold, mapper, reducer, kwargs),
+                chunks)
+
+        if tree:
+            partials = list(partials)
+            while len(partials) > 1:
+                pairs = list(zip(partials[::2], partials[1::2]))
+                rest = partials[len(pairs) * 2:]
+                partials = pool.map(functools.partial(
+                    parallel._reduce_pair, reducer), pairs) + rest
+
+        partials = iter(partials)
+        result = next(partials) if initializer is None else initializer
+        for partial in partials:
+            result = reducer(result, partial)
+
+        return result
+
+    def _tasks(self, function):
+        """Give the function and members to send to worker processes.
+
+        """
+        return function, self._list()
+
 
 class View(CollectionMixin):
     """An ordered set of Trees and Leaves.
@@ -72,12 +689,47 @@ class View(CollectionMixin):
     _agglimbs = set()
 
     def __init__(self, *vegs, **kwargs):
-        self._state = list()
+        # members keyed by absolute path, in order of addition
+        self._state = OrderedDict()
         self.add(*vegs)
 
+    def _subset(self, indices):
+        """Give a View of the members at the given positions.
+
+        """
+        items = list(self._state.items())
+        return self._from_items([items[i] for i in indices])
+
+    @classmethod
+    def _from_items(cls, items):
+        """Build a View directly from (abspath, member) pairs, skipping
+        input handling.
+
+        """
+        out = cls()
+        for key, member in items:
+            out._state.setdefault(key, member)
+        return out
+
     def __repr__(self):
         return "<View({})>".format(self._list())
 
+    def __contains__(self, item):
+        try:
+            return item.abspath in self._state
+        except AttributeError:
+            return False
+
+    def __eq__(self, other):
+        if isinstance(other, View):
+            return set(self._state) == set(other._state)
+        return super(View, self).__eq__(other)
+
+    def __lt__(self, other):
+        if isinstance(other, View):
+            return set(self._state) < set(other._state)
+        return super(View, self).__lt__(other)
+
     def __getitem__(self, index):
         """Get member corresponding to the given index or slice.
 
@@ -143,12 +795,16 @@ class View(CollectionMixin):
 
         """
         if isinstance(other, View):
-            return View(list(set(self) - set(other)))
+            exclude = other._state
         elif isinstance(other, (Tree, Leaf)):
-            return View(list(set(self) - set([other])))
+            exclude = (other.abspath,)
         else:
             raise TypeError("Right operand must be a Tree, Leaf, or View.")
 
+        return View._from_items((key, member)
+                                for key, member in self._state.items()
+                                if key not in exclude)
+
     def __or__(self, other):
         """Return a View giving the union of Views `self` and `other`.
 
@@ -163,7 +819,9 @@ class View(CollectionMixin):
 
         """
         if isinstance(other, View):
-            return View(list(set(self) & set(other)))
+            return View._from_items((key, member)
+                                    for key, member in self._state.items()
+                                    if key in other._state)
         else:
             raise TypeError("Operands must be Views.")
 
@@ -173,7 +831,11 @@ class View(CollectionMixin):
 
         """
         if isinstance(other, View):
-            return View(list(set(self) ^ set(other)))
+            return View._from_items(
+                [(key, member) for key, member in self._state.items()
+                 if key not in other._state] +
+                [(key, member) for key, member in other._state.items()
+                 if key not in self._state])
         else:
             raise TypeError("Operands must be Views.")
 
@@ -250,9 +912,12 @@ class View(CollectionMixin):
                 pass
             elif isinstance(veg, (list, tuple)):
                 self.add(*veg)
-            elif isinstance(veg, (View, Bundle)):
+            elif isinstance(veg, View):
+                for key, member in veg._state.items():
+                    self._state.setdefault(key, member)
+            elif isinstance(veg, Bundle):
                 self.add(*list(veg))
-            elif isinstance(veg, Treant):
+            elif isinstance(veg, (Treant, TreantHandle)):
                 outconts.append(veg.tree)
             elif isinstance(veg, Veg):
                 outconts.append(veg)
@@ -288,14 +953,13 @@ class View(CollectionMixin):
                 Tree or Leaf to add
 
         """
-        if member not in self._state:
-            self._state.append(member)
+        self._state.setdefault(member.abspath, member)
 
     def _list(self):
         """Return a list of members.
 
         """
-        return list(self._state)
+        return list(self._state.values())
 
     @property
     def names(self):
@@ -380,53 +1044,99 @@ class View(CollectionMixin):
         """
         return [member.exists for member in self]
 
-    def map(self, function, processes=1, **kwargs):
-        """Apply a function to each member, perhaps in parallel.
+    def hashes(self, algorithm='sha256', processes=1, hidden=False):
+        """Compute digests of the contents of member Leaves and of all files
+        within member Trees.
 
-        A pool of processes is created for `processes` > 1; for example,
-        with 40 members and ``processes=4``, 4 processes will be created,
-        each working on a single member at any given time. When each process
-        completes work on a member, it grabs another, until no members remain.
+        Files within member Trees use each Tree's digest cache, as with
+        :meth:`Tree.hashes`. All files needing to be hashed are hashed in a
+        single pool of processes.
 
-        `kwargs` are passed to the given function when applied to each member
+        Parameters
+        ----------
+        algorithm : str
+            Name of any hashing algorithm supported by :mod:`hashlib`.
+        processes : int
+            How many processes to use for hashing files that are not cached.
+        hidden : bool
+            If True, include hidden files and the contents of hidden
+            directories within member Trees.
+
+        Returns
+        -------
+        dict
+            Absolute paths of files as keys; hex digests of their contents as
+            values.
+
+        """
+        from .trees import _digest_all
+
+        digests = dict()
+        plans = list()
+        paths = list()
+        for member in self:
+            if isinstance(member, Tree):
+                stats = member._stat_files(hidden=hidden)
+                cached, stale, orphans = member._hashplan(algorithm, stats,
+                                                          hidden=hidden)
+                digests.update((os.path.join(member.abspath, relpath), digest)
+                               for relpath, digest in cached.items())
+                plans.append((member, stale, orphans))
+                paths.extend(abspath for relpath, abspath, key in stale)
+            else:
+                paths.append(member.abspath)
+
+        computed = dict(zip(paths, _digest_all(paths, algorithm=algorithm,
+                                               processes=processes)))
+        digests.update(computed)
+
+        for member, stale, orphans in plans:
+            member._hashstore(algorithm, stale,
+                              [computed[abspath]
+                               for relpath, abspath, key in stale],
+                              orphans)
+
+        return digests
+
+    def write_many(self, data, processes=1):
+        """Atomically write contents to many Leaves, perhaps in parallel.
+
+        Each Leaf is written with :meth:`Leaf.write`, so its contents are
+        replaced in one step under an exclusive lock. Writes to different
+        Leaves are independent; a failure for one does not undo the others.
 
         Parameters
         ----------
-        function : function
-            Function to apply to each member. Must take only a single Treant
-            instance as input, but may take any number of keyword arguments.
+        data : dict
+            Leaves, or paths to files, as keys and the ``str`` or ``bytes``
+            contents to write to each as values.
         processes : int
-            How many processes to use. If 1, applies function to each member in
-            member order in serial.
+            How many processes to use. If 1, writes are done in serial.
 
         Returns
         -------
-        results : list
-            List giving the result of the function for each member, in member
-            order. If the function returns ``None`` for each member, then only
-            ``None`` is returned instead of a list.
+        View
+            A View of the Leaves written.
+
         """
+        items = [(Leaf(leaf) if isinstance(leaf, string_types) else leaf,
+                  contents) for leaf, contents in data.items()]
+
         if processes > 1:
             pool = mp.Pool(processes=processes)
-            results = dict()
-            results = {member.abspath: pool.apply_async(
-                    function, args=(member,), kwds=kwargs) for member in self}
+            results = [pool.apply_async(_write_leaf, args=item)
+                       for item in items]
 
-            output = {key: results[key].get() for key in results}
+            for result in results:
+                result.get()
 
             pool.close()
             pool.join()
-
-            # sort by member order
-            results = [output[abspath] for abspath in self.abspaths]
         else:
-            results = [function(member, **kwargs) for member in self]
-
-        # check if list is all ``None``: if so, we return ``None``
-        if all([(i is None) for i in results]):
-            results = None
+            for item in items:
+                _write_leaf(*item)
 
-        return results
+        return View([leaf for leaf, contents in items])
 
     def glob(self, pattern):
         """Return a View of all child Leaves and Trees of members matching
@@ -479,6 +1189,12 @@ class Bundle(CollectionMixin):
         can be given as either objects or paths to directories that contain
         Treant statefiles. Glob patterns are also allowed, and all found
         Treants will be added to the collection.
+    cachesize : int
+        Most loaded members to keep, evicting the least recently used beyond
+        that; if ``None``, there is no limit.
+    weakcache : bool
+        If ``True``, keep loaded members only as long as something else refers
+        to them; `cachesize` does not apply.
     """
     _memberpaths = ['abspath']
     _fields = ['uuid', 'treanttype']
@@ -488,8 +1204,13 @@ class Bundle(CollectionMixin):
     _agglimbs = set()
 
     def __init__(self, *treants, **kwargs):
-        self._cache = dict()
+        self._cache = MemberCache(kwargs.pop('cachesize', CACHESIZE),
+                                  weak=kwargs.pop('weakcache', False))
         self._state = list()
+        # position of each member record in state, by uuid
+        self._index = dict()
+        # uuids of members with each name, in the order they were added
+        self._names = dict()
         self._searchtime = 10
 
         self.add(*treants)
@@ -497,6 +1218,80 @@ class Bundle(CollectionMixin):
     def __repr__(self):
         return "<Bundle({})>".format(self._list())
 
+    def __len__(self):
+        return len(self._get_members_uuid())
+
+    def __iter__(self):
+        # members not yet loaded are given as handles, loaded only when needed
+        for member in self._get_member_records():
+            treant = self._cache.get(member['uuid'])
+            if treant:
+                yield treant
+            else:
+                yield TreantHandle(member['uuid'], member['treanttype'],
+                                   member['abspath'], bundle=self)
+
+    def __getstate__(self):
+        # members as parallel arrays; loaded members are not included
+        members = self._get_members()
+        state = {field: members[field] for field in self._fields}
+        state['searchtime'] = self._searchtime
+        state['cachesize'] = self._cache.maxsize
+        state['weakcache'] = self._cache.weak
+        return state
+
+    def __setstate__(self, state):
+        self._cache = MemberCache(state['cachesize'],
+                                  weak=state['weakcache'])
+        self._state = list()
+        self._index = dict()
+        self._names = dict()
+        self._searchtime = state['searchtime']
+
+        self._add_members(state['uuid'], state['treanttype'],
+                          state['abspath'])
+
+    def __eq__(self, other):
+        if isinstance(other, Bundle):
+            return set(self._get_members_uuid()) == self._uuids_of(other)
+        return super(Bundle, self).__eq__(other)
+
+    # comparisons are of member uuids, as sets; these are only partially
+    # ordered, so none can be derived from the others
+    def __lt__(self, other):
+        if isinstance(other, Bundle):
+            return set(self._get_members_uuid()) < self._uuids_of(other)
+        return super(Bundle, self).__lt__(other)
+
+    def __le__(self, other):
+        if isinstance(other, Bundle):
+            return set(self._get_members_uuid()) <= self._uuids_of(other)
+        return super(Bundle, self).__le__(other)
+
+    def __gt__(self, other):
+        if isinstance(other, Bundle):
+            return set(self._get_members_uuid()) > self._uuids_of(other)
+        return super(Bundle, self).__gt__(other)
+
+    def __ge__(self, other):
+        if isinstance(other, Bundle):
+            return set(self._get_members_uuid()) >= self._uuids_of(other)
+        return super(Bundle, self).__ge__(other)
+
+    def __contains__(self, item):
+        """Returns True if the given Treant, or Treant uuid, is a member.
+
+        """
+        if isinstance(item, string_types):
+            uuid = item
+        else:
+            try:
+                uuid = item.uuid
+            except AttributeError:
+                return False
+
+        return self._get_member(uuid) is not None
+
     def __str__(self):
         out = "<- Bundle ->\n"
 
@@ -520,36 +1315,35 @@ class Bundle(CollectionMixin):
         """
         # we can take lists of indices, names, or uuids; these return a
         # Bundle; repeats already not respected since Bundle functions as a
-        # set
+        # set; only members returned as Treants are loaded
         if ((isinstance(index, list) or hasattr(index, 'dtype')) and
                 all([isinstance(item, bool) for item in index])):
             # boolean indexing
-            memberlist = self._list()
-            out = Bundle([memberlist[i] for i, val in enumerate(index) if val])
+            members = self._get_member_records()
+            out = self._bundle([members[i]
+                                for i, val in enumerate(index) if val])
         elif isinstance(index, list):
-            memberlist = self._list()
-            out = Bundle([memberlist[item] for item in index])
+            members = self._get_member_records()
+            out = self._bundle([members[item] for item in index])
         elif isinstance(index, int):
             # an index gets the member at that position
-            out = self._list()[index]
+            out = self._fetch([self._get_member_at(index)])[0]
         elif isinstance(index, string_types):
             # a name or uuid can be used for indexing
             # a name always returns a Bundle
-            out = Bundle([self.filepaths[i] for i, name
-                          in enumerate(self.names) if name == index])
+            out = self._bundle(self._get_members_named(index))
 
             # if no names match, we try uuids
             if not len(out):
-                out = [member for member in self if member.uuid == index]
-                if not len(out):
+                member = self._get_member(index)
+                if member is None:
                     raise KeyError("No name or uuid matching string selection")
-                else:
-                    # we want to return a Treant, not a list for uuid matches
-                    out = out[0]
+
+                # we want to return a Treant, not a list for uuid matches
+                out = self._fetch([member])[0]
         elif isinstance(index, slice):
             # we also take slices, obviously
-            out = Bundle(*self.filepaths[index])
-            out._cache.update(self._cache)
+            out = self._bundle(self._get_member_records()[index])
         else:
             raise IndexError("Cannot index Bundle with given values")
 
@@ -561,7 +1355,10 @@ class Bundle(CollectionMixin):
         """
         from .treants import Treant
 
-        if isinstance(other, (Treant, Bundle, list)):
+        if isinstance(other, (Treant, TreantHandle, Bundle)):
+            return self._bundle(self._get_member_records() +
+                                self._records_of(other))
+        elif isinstance(other, list):
             return Bundle(self, other)
         else:
             raise TypeError("Operands must be Treant-derived or Bundles.")
@@ -574,10 +1371,11 @@ class Bundle(CollectionMixin):
         """
         from .treants import Treant
 
-        if isinstance(other, Bundle):
-            return Bundle(list(set(self) - set(other)))
-        elif isinstance(other, Treant):
-            return Bundle(list(set(self) - set([other])))
+        if isinstance(other, (Treant, TreantHandle, Bundle)):
+            uuids = self._uuids_of(other)
+            return self._bundle([member for member
+                                 in self._get_member_records()
+                                 if member['uuid'] not in uuids])
         else:
             raise TypeError("Operands must be Treant-derived or Bundles.")
 
@@ -586,7 +1384,8 @@ class Bundle(CollectionMixin):
 
         """
         if isinstance(other, Bundle):
-            return Bundle(self, other)
+            return self._bundle(self._get_member_records() +
+                                other._get_member_records())
         else:
             raise TypeError("Operands must be Bundles.")
 
@@ -595,7 +1394,10 @@ class Bundle(CollectionMixin):
 
         """
         if isinstance(other, Bundle):
-            return Bundle(list(set(self) & set(other)))
+            uuids = self._uuids_of(other)
+            return self._bundle([member for member
+                                 in self._get_member_records()
+                                 if member['uuid'] in uuids])
         else:
             raise TypeError("Operands must be Bundles.")
 
@@ -605,10 +1407,38 @@ class Bundle(CollectionMixin):
 
         """
         if isinstance(other, Bundle):
-            return Bundle(list(set(self) ^ set(other)))
+            members = self._get_member_records()
+            others = other._get_member_records()
+            uuids = set(member['uuid'] for member in members)
+            otheruuids = set(member['uuid'] for member in others)
+            return self._bundle(
+                [member for member in members
+                 if member['uuid'] not in otheruuids] +
+                [member for member in others if member['uuid'] not in uuids])
         else:
             raise TypeError("Operands must be Bundles.")
 
+    @staticmethod
+    def _records_of(other):
+        """Get member records for a Bundle, or a one-member list of records
+        for a Treant, without loading anything.
+
+        """
+        if isinstance(other, Bundle):
+            return other._get_member_records()
+        return [{'uuid': other.uuid,
+                 'treanttype': other.treanttype,
+                 'abspath': other.abspath}]
+
+    @staticmethod
+    def _uuids_of(other):
+        """Get the set of uuids for a Bundle's members, or for a Treant.
+
+        """
+        if isinstance(other, Bundle):
+            return set(other._get_members_uuid())
+        return set([other.uuid])
+
     @classmethod
     def _attach_agglimb_class(cls, limb):
         """Attach a agglimb to the class.
@@ -689,11 +1519,19 @@ class Bundle(CollectionMixin):
             elif isinstance(treant, (list, tuple, View)):
                 self.add(*treant)
             elif isinstance(treant, Bundle):
-                self.add(*treant.filepaths)
-                self._cache.update(treant._cache)
+                # take member records as they are; members are not loaded
+                members = treant._get_members()
+                self._add_members(members['uuid'], members['treanttype'],
+                                  members['abspath'])
+                if treant._cache is not self._cache:
+                    self._cache.update(treant._cache)
             elif isinstance(treant, Treant):
                 outconts.append(treant)
                 self._cache[treant.uuid] = treant
+            elif isinstance(treant, TreantHandle):
+                outconts.append(treant)
+                if treant._treant is not None:
+                    self._cache[treant.uuid] = treant._treant
             elif isinstance(treant, (Leaf, Tree)):
                 tre = filesystem.path2treant(treant.abspath)
                 outconts.extend(tre)
@@ -728,13 +1566,13 @@ class Bundle(CollectionMixin):
         for member in members:
             if isinstance(member, int):
                 remove.append(uuids[member])
-            elif isinstance(member, Treant):
+            elif isinstance(member, (Treant, TreantHandle)):
                 remove.append(member.uuid)
             elif isinstance(member, string_types):
-                names = fnmatch.filter(self.names, member)
-                uuids = [member.uuid for member in self
-                         if member.name in names]
-                remove.extend(uuids)
+                names = set(fnmatch.filter(self.names, member))
+                remove.extend(rec['uuid']
+                              for rec in self._get_member_records()
+                              if os.path.basename(rec['abspath']) in names)
 
             else:
                 raise TypeError('Only an integer or treant acceptable')
@@ -762,71 +1600,64 @@ class Bundle(CollectionMixin):
     def names(self):
         """Return a list of member names.
 
-        Members that can't be found will have name ``None``.
+        Names are taken from the stored member records, so no members are
+        loaded; they reflect each member's last known location.
 
         :Returns:
             *names*
-                list giving the name of each member, in order;
-                members that are missing will have name ``None``
+                list giving the name of each member, in order
 
         """
-        names = list()
-        for member in self._list():
-            if member:
-                names.append(member.name)
-            else:
-                names.append(None)
-
-        return names
+        return self._get_members_names()
 
     @property
     def abspaths(self):
         """Return a list of absolute member directory paths.
 
-        Members that can't be found will have path ``None``.
+        Paths are taken from the stored member records, so no members are
+        loaded; they give each member's last known location.
 
         :Returns:
             *names*
                 list giving the absolute directory path of each member, in
-                order; members that are missing will have path ``None``
+                order
 
         """
-        return [member.abspath if member else None for member in self._list()]
+        return [member['abspath'] + os.sep
+                for member in self._get_member_records()]
 
     @property
     def relpaths(self):
         """Return a list of relative member directory paths.
 
-        Members that can't be found will have path ``None``.
+        Paths are taken from the stored member records, so no members are
+        loaded; they give each member's last known location.
 
         :Returns:
             *names*
                 list giving the relative directory path of each member, in
-                order; members that are missing will have path ``None``
+                order
 
         """
-        return [member.relpath if member else None for member in self._list()]
+        return [os.path.relpath(member['abspath']) + os.sep
+                for member in self._get_member_records()]
 
     @property
     def filepaths(self):
         """Return a list of member filepaths.
 
-        Members that can't be found will have filepath ``None``.
+        Paths are taken from the stored member records, so no members are
+        loaded; they give each member's last known location.
 
         :Returns:
             *names*
-                list giving the filepath of each member, in order;
-                members that are missing will have filepath ``None``
+                list giving the filepath of each member, in order
 
         """
-        filepaths = list()
-        for member in self._list():
-            if member:
-                filepaths.append(member.filepath)
-            else:
-                filepaths.append(None)
-
-        return filepaths
+        return [os.path.join(member['abspath'],
+                             filesystem.statefilename(member['treanttype'],
+                                                      member['uuid']))
+                for member in self._get_member_records()]
 
     @property
     def uuids(self):
@@ -866,100 +1697,117 @@ class Bundle(CollectionMixin):
         Note: modifications of this list won't modify the members of the
         collection!
 
-        Missing members will be present in the list as ``None``. This method is
-        not intended for user-level use.
+        This method is not intended for user-level use.
 
         """
-        members = self._get_members()
-        uuids = members['uuid']
+        return self._fetch(self._get_member_records())
+
+    def _fetch(self, members):
+        """Return Treants for the given member records.
+
+        Cached Treants are used where available; the rest are loaded from
+        their last known locations, or tracked down if they have moved.
+
+        :Arguments:
+            *members*
+                list of member records, as given by
+                :meth:`_get_member_records`
+
+        :Returns:
+            *treants*
+                list of Treants, in the same order as the given records
 
+        """
         findlist = list()
         memberlist = list()
 
-        for uuid in uuids:
-            if uuid in self._cache and self._cache[uuid]:
-                memberlist.append(self._cache[uuid])
-            else:
-                memberlist.append(None)
-                findlist.append(uuid)
+        for member in members:
+            treant = self._cache.get(member['uuid'])
+            memberlist.append(treant)
+            if treant is None:
+                findlist.append(member)
 
         # track down our non-cached treants
         if findlist:
-            paths = {path: members[path]
+            paths = {path: [member[path] for member in findlist]
                      for path in self._memberpaths}
-            foxhound = filesystem.Foxhound(self, findlist, paths,
-                                           timeout=self.searchtime)
+            foxhound = filesystem.Foxhound(
+                    self, [member['uuid'] for member in findlist], paths,
+                    timeout=self.searchtime)
             foundconts = foxhound.fetch(as_treants=True)
 
-            # add to cache, and ensure we get updated paths with a re-add in
-            # case of an IOError, skip (probably due to permissions, but will
-            # need something more robust later
+            # add to cache, and record new paths of any that moved with a
+            # re-add; in case of an IOError, skip (probably due to
+            # permissions, but will need something more robust later
             self._cache.update(foundconts)
-            try:
-                self.add(*foundconts.values())
-            except OSError:
-                pass
+            moved = [foundconts[member['uuid']] for member in findlist
+                     if foundconts[member['uuid']] and
+                     os.path.abspath(foundconts[member['uuid']].abspath) !=
+                     os.path.abspath(member['abspath'])]
+            if moved:
+                try:
+                    self.add(*moved)
+                except OSError:
+                    pass
 
             # insert found treants into output list
-            for uuid in findlist:
-                result = foundconts[uuid]
+            for i, member in enumerate(members):
+                if memberlist[i] is not None:
+                    continue
+
+                result = foundconts[member['uuid']]
                 if not result:
-                    ind = list(members['uuid']).index(uuid)
+                    ind = self._get_members_uuid().index(member['uuid'])
                     raise IOError("Could not find member {} (uuid: {});"
-                                  " re-add or remove it.".format(ind, uuid))
+                                  " re-add or remove it.".format(
+                                      ind, member['uuid']))
 
-                memberlist[list(uuids).index(uuid)] = result
+                memberlist[i] = result
 
         return memberlist
 
-    def map(self, function, processes=1, **kwargs):
-        """Apply a function to each member, perhaps in parallel.
+    def _tasks(self, function):
+        # workers get each member as (treanttype, filepath), reusing Treants
+        # they loaded for earlier tasks
+        records = self._get_member_records()
+        refs = [(member['treanttype'],
+                 os.path.join(member['abspath'], filesystem.statefilename(
+                     member['treanttype'], member['uuid'])))
+                for member in records]
 
-        A pool of processes is created for *processes* > 1; for example,
-        with 40 members and 'processes=4', 4 processes will be created,
-        each working on a single member at any given time. When each process
-        completes work on a member, it grabs another, until no members remain.
+        # members no longer where recorded are tracked down here, in one go
+        missing = [i for i, (_, filepath) in enumerate(refs)
+                   if not os.path.exists(filepath)]
+        if missing:
+            found = self._fetch([records[i] for i in missing])
+            for i, treant in zip(missing, found):
+                refs[i] = (treant.treanttype, treant.filepath)
 
-        *kwargs* are passed to the given function when applied to each member
+        return functools.partial(parallel._apply_treant, function), refs
 
-        :Arguments:
-            *function*
-                function to apply to each member; must take only a single
-                treant instance as input, but may take any number of keyword
-                arguments
+    def _subset(self, indices):
+        members = self._get_member_records()
+        return self._bundle([members[i] for i in indices])
 
-        :Keywords:
-            *processes*
-                how many processes to use; if 1, applies function to each
-                member in member order
+    def _bundle(self, members):
+        """Return a new Bundle of the given member records.
 
-        :Returns:
-            *results*
-                list giving the result of the function for each member,
-                in member order; if the function returns ``None`` for each
-                member, then only ``None`` is returned instead of a list
-            """
-        if processes > 1:
-            pool = mp.Pool(processes=processes)
-            results = dict()
-            results = {member.uuid: pool.apply_async(
-                    function, args=(member,), kwds=kwargs) for member in self}
-
-            output = {key: results[key].get() for key in results}
+        No members are loaded; the new Bundle shares this Bundle's cache.
 
-            pool.close()
-            pool.join()
+        :Arguments:
+            *members*
+                list of member records, as given by
+                :meth:`_get_member_records`
 
-            # sort by member order
-            results = [output[uuid] for uuid in self.uuids]
-        else:
-            results = [function(member, **kwargs) for member in self]
+        """
+        out = Bundle()
+        out._add_members([member['uuid'] for member in members],
+                         [member['treanttype'] for member in members],
+                         [member['abspath'] for member in members])
 
-        # check if list is all ``None``: if so, we return ``None``
-        if all([(i is None) for i in results]):
-            results = None
+        out._cache = self._cache
 
-        return results
+        return out
 
     @property
     def searchtime(self):
@@ -980,11 +1828,204 @@ class Bundle(CollectionMixin):
         else:
             raise TypeError("Must give a number or `None` for searchtime")
 
+    @property
+    def cachesize(self):
+        """Most loaded members to keep.
+
+        The least recently used members are evicted beyond this. If `None`,
+        there is no limit.
+
+        """
+        return self._cache.maxsize
+
+    @cachesize.setter
+    def cachesize(self, value):
+        if isinstance(value, int) or value is None:
+            self._cache.maxsize = value
+        else:
+            raise TypeError("Must give an integer or `None` for cachesize")
+
+    def cache_info(self):
+        """Report hits, misses, evictions and size of the member cache.
+
+        Returns
+        -------
+        info : CacheInfo
+            namedtuple of (hits, misses, evictions, maxsize, currsize)
+
+        """
+        return self._cache.cache_info()
+
+    def save(self, path):
+        """Write this Bundle's members to a manifest file.
+
+        The manifest gives the uuid, treant type and location of each member,
+        in member order, as JSON. It is replaced atomically, so a Bundle
+        loaded from it concurrently sees either the old members or the new.
+        No members are loaded to write it.
+
+        Parameters
+        ----------
+        path : str or Leaf
+            Path of the manifest file.
+
+        Returns
+        -------
+        Leaf
+            The manifest file.
+
+        See Also
+        --------
+        load : make a Bundle from a manifest file
+
+        """
+        members = self._get_members()
+        manifest = {field: members[field] for field in Bundle._fields}
+        manifest['searchtime'] = self.searchtime
+
+        leaf = path if isinstance(path, Leaf) else Leaf(path)
+        with leaf.atomic_writer('w') as f:
+            json.dump(manifest, f)
+
+        return leaf
+
+    @classmethod
+    def load(cls, path):
+        """Make a Bundle from a manifest file written by :meth:`save`.
+
+        The manifest is read in one go and nothing else is touched on the
+        filesystem; members are loaded, and tracked down if they have moved,
+        only when they are used.
+
+        Parameters
+        ----------
+        path : str or Leaf
+            Path of the manifest file.
+
+        Returns
+        -------
+        Bundle
+            Bundle of the members given in the manifest, in order.
+
+        """
+        with open(str(path)) as f:
+            manifest = json.load(f)
+
+        bundle = cls()
+        bundle.searchtime = manifest['searchtime']
+        bundle._add_members(manifest['uuid'], manifest['treanttype'],
+                            manifest['abspath'])
+        return bundle
+
+    def _keyed(self, key):
+        """Get member records with a value for `key`, as (value, record)
+        pairs, and the records of members without one.
+
+        """
+        records = self._get_member_records()
+        if callable(key):
+            values = [key(member) for member in self._list()]
+        else:
+            values = [categories.get(key) for categories
+                      in self.categories._snapshot()]
+
+        keyed = list()
+        missing = list()
+        for value, record in zip(values, records):
+            if value is None:
+                missing.append(record)
+            else:
+                keyed.append((value, record))
+
+        return keyed, missing
+
+    def sort_by(self, key, reverse=False):
+        """Return a Bundle of the members sorted by a category or computed
+        value.
+
+        Category values are read in a single pass, once per member. Members
+        without a value for `key` come last, in their current order; so do
+        members with equal values.
+
+        Parameters
+        ----------
+        key : str or callable
+            Category to sort by, or a function giving the value to sort by
+            for a member; a function giving ``None`` counts as no value.
+        reverse : bool
+            If ``True``, sort from largest to smallest value.
+
+        Returns
+        -------
+        Bundle
+            The members in sorted order.
+
+        """
+        keyed, missing = self._keyed(key)
+        keyed.sort(key=lambda item: item[0], reverse=reverse)
+        return self._bundle([record for _, record in keyed] + missing)
+
+    def top(self, k, key):
+        """Return a Bundle of the `k` members with the largest values of a
+        category or computed value, largest first.
+
+        This gives the same members as ``sort_by(key, reverse=True)[:k]``,
+        but without sorting every member. Members without a value for `key`
+        are only included if fewer than `k` members have one.
+
+        Parameters
+        ----------
+        k : int
+            Number of members to give.
+        key : str or callable
+            Category to rank by, or a function giving the value to rank by
+            for a member; a function giving ``None`` counts as no value.
+
+        Returns
+        -------
+        Bundle
+            The top `k` members, in order.
+
+        """
+        keyed, missing = self._keyed(key)
+        keyed = heapq.nlargest(k, keyed, key=lambda item: item[0])
+        return self._bundle(
+            [record for _, record in keyed] + missing[:k - len(keyed)])
+
+    def bottom(self, k, key):
+        """Return a Bundle of the `k` members with the smallest values of a
+        category or computed value, smallest first.
+
+        This gives the same members as ``sort_by(key)[:k]``, but without
+        sorting every member. Members without a value for `key` are only
+        included if fewer than `k` members have one.
+
+        Parameters
+        ----------
+        k : int
+            Number of members to give.
+        key : str or callable
+            Category to rank by, or a function giving the value to rank by
+            for a member; a function giving ``None`` counts as no value.
+
+        Returns
+        -------
+        Bundle
+            The bottom `k` members, in order.
+
+        """
+        keyed, missing = self._keyed(key)
+        keyed = heapq.nsmallest(k, keyed, key=lambda item: item[0])
+        return self._bundle(
+            [record for _, record in keyed] + missing[:k - len(keyed)])
+
     def flatten(self, exclude=None):
         """Return a flattened version of this Bundle.
 
         The resulting Bundle will have all members of any member Groups,
-        without the Groups.
+        without the Groups. Groups are walked breadth-first, each only once,
+        so Groups that are members of themselves or of each other are fine.
+        Only Groups are loaded; other members are taken as recorded.
 
         Parameters
         ----------
@@ -998,21 +2039,182 @@ class Bundle(CollectionMixin):
             the flattened Bundle with no Groups
 
         """
-        if not exclude:
-            exclude = list()
+        return self._bundle([member for collection, member
+                             in self._flatten(exclude)])
+
+    def iterflatten(self, exclude=None):
+        """Iterate over the members of this Bundle, giving the members of any
+        member Groups in place of the Groups.
+
+        Works as :meth:`flatten`, but gives members one at a time as they are
+        reached, as :class:`TreantHandle` objects.
+
+        Parameters
+        ----------
+        exclude : list
+            uuids of Groups to leave out of flattening.
+
+        Returns
+        -------
+        members : iterator
+            Handles for the members, with no Groups.
+
+        """
+        for collection, member in self._flatten(exclude):
+            yield TreantHandle(member['uuid'], member['treanttype'],
+                               member['abspath'], bundle=collection)
+
+    def _flatten(self, exclude=None):
+        """Walk members and members of member Groups breadth-first, giving
+        each non-Group member once, with the collection it was found in.
+
+        """
+        visited = set(exclude or ())
+        found = set()
+        queue = deque((self, member) for member in self._get_member_records())
+
+        while queue:
+            collection, member = queue.popleft()
+            uuid = member['uuid']
+            if hasattr(_TREANTS.get(member['treanttype']), 'members'):
+                if uuid in visited:
+                    continue
+                visited.add(uuid)
+
+                members = collection._fetch([member])[0].members
+                queue.extend((members, submember) for submember
+                             in members._get_member_records())
+            elif uuid not in found:
+                found.add(uuid)
+                yield collection, member
+
+    def diff(self, other_root, hidden=False, processes=1):
+        """Compare each member to the directory of the same name within
+        another directory.
+
+        This is useful for checking copies of Treants, such as scratch or
+        archived copies, against the originals. Each comparison is done as with
+        :meth:`Tree.diff`; members are compared in parallel for `processes` >
+        1.
 
-        guuids = list(exclude)
-        memberlist = self._list()
-        flattened = Bundle()
+        Parameters
+        ----------
+        other_root : str or Tree
+            Directory containing the Treants to compare members against.
+        hidden : bool
+            If True, include hidden files and the contents of hidden
+            directories.
+        processes : int
+            How many processes to use.
+
+        Returns
+        -------
+        list
+            :class:`~datreant.core.trees.TreeDiff` for each member, in member
+            order, giving files added, removed, and modified in the other
+            directory relative to the member.
+
+        """
+        if isinstance(other_root, Tree):
+            other_root = other_root.abspath
 
-        for member in memberlist:
-            if hasattr(member, 'members') and member.uuid not in exclude:
-                guuids.append(member.uuid)
-                flattened += member.members.flatten(guuids)
-            elif not hasattr(member, 'members'):
-                flattened.add(member)
+        return self.map(_diff_member, processes=processes,
+                        root=os.path.abspath(other_root), hidden=hidden)
 
-        return flattened
+    def copy(self, dest_root, processes=1, link=None, newuuids=False):
+        """Copy each member into a directory of the same name within
+        `dest_root`.
+
+        Files already present in the destination with the same size and
+        modification time are not copied again, so this can be used to
+        cheaply refresh copies. All files are copied with a single pool of
+        processes.
+
+        Parameters
+        ----------
+        dest_root : str or Tree
+            Directory in which to place the copies; created if it doesn't
+            exist.
+        processes : int
+            How many processes to use for copying files.
+        link : {None, 'hard', 'reflink'}
+            If 'hard', hardlink files instead of copying them; if 'reflink',
+            make copy-on-write clones. Either falls back to copying when the
+            filesystem doesn't support it, such as across devices.
+        newuuids : bool
+            If True, give each copy a newly generated uuid; otherwise copies
+            keep the uuids of the originals. Refreshing a copy made with new
+            uuids keeps the uuid it was given.
+
+        Returns
+        -------
+        Bundle
+            The copies, in member order.
+
+        Raises
+        ------
+        ValueError
+            If any members have the same name.
+
+        """
+        from .trees import _transfer_all
+
+        if isinstance(dest_root, Tree):
+            dest_root = dest_root.abspath
+
+        if link not in (None, 'hard', 'reflink'):
+            raise ValueError("link must be None, 'hard', or 'reflink'")
+
+        # members go to directories named after them, so names must differ
+        seen = set()
+        duplicates = set()
+        for name in self.names:
+            if name in seen:
+                duplicates.add(name)
+            seen.add(name)
+        if duplicates:
+            raise ValueError("Members with the same name can't be copied to"
+                             " one directory: {}".format(sorted(duplicates)))
+
+        jobs = list()
+        statefiles = list()
+        for member in self:
+            dest = os.path.join(os.path.abspath(dest_root), member.name)
+            statefile = os.path.join(dest, os.path.basename(member.filepath))
+
+            # a copy made before with a new uuid keeps that uuid
+            previous = [path for path in filesystem.glob_treant(dest)
+                        if path != statefile and
+                        os.path.basename(path).split('.')[0] ==
+                        member.treanttype]
+
+            jobs.extend(member.tree._syncplan(dest, link=link, delete=False))
+            statefiles.append((member.treanttype, statefile, previous))
+
+        _transfer_all(jobs, processes=processes)
+
+        copies = list()
+        for treanttype, statefile, previous in statefiles:
+            if newuuids:
+                dest = os.path.dirname(statefile)
+                if previous:
+                    newfile = previous[0]
+                else:
+                    newfile = os.path.join(dest, filesystem.statefilename(
+                        treanttype, str(uuid4())))
+                os.rename(statefile, newfile)
+
+                # the lock proxy belongs to the old state file
+                proxy = os.path.join(
+                    dest, ".{}.proxy".format(os.path.basename(statefile)))
+                if os.path.exists(proxy):
+                    os.remove(proxy)
+
+                statefile = newfile
+
+            copies.append(statefile)
+
+        return Bundle(copies)
 
     @property
     def trees(self):
@@ -1072,12 +2274,18 @@ class Bundle(CollectionMixin):
                       'abspath': os.path.abspath(abspath)}
 
         # check if uuid already present
-        uuids = [member['uuid'] for member in self._state]
-
-        if uuid in uuids:
-            self._state[uuids.index(uuid)] = member_rec
-        else:
+        try:
+            i = self._index[uuid]
+        except KeyError:
+            self._index[uuid] = len(self._state)
             self._state.append(member_rec)
+        else:
+            self._names[os.path.basename(
+                self._state[i]['abspath'])].remove(uuid)
+            self._state[i] = member_rec
+
+        self._names.setdefault(os.path.basename(member_rec['abspath']),
+                               list()).append(uuid)
 
     def _del_members(self, uuids=None, all=False):
         """Remove members from the Bundle.
@@ -1091,24 +2299,20 @@ class Bundle(CollectionMixin):
         """
         if all:
             self._state = list()
+            self._index = dict()
+            self._names = dict()
         else:
             # remove redundant uuids from given list if present
             uuids = set([str(uuid) for uuid in uuids])
 
-            # get matching rows
-            memberlist = list()
-            for i, member in enumerate(self._state):
-                for uuid in uuids:
-                    if (member['uuid'] == uuid):
-                        memberlist.append(i)
-
-            memberlist.sort()
-            j = 0
-            # delete matching entries; have to use j to shift the register as
-            # we remove entries
-            for i in memberlist:
-                self._state.pop(i - j)
-                j = j + 1
+            self._state = [member for member in self._state
+                           if member['uuid'] not in uuids]
+            self._index = {member['uuid']: i
+                           for i, member in enumerate(self._state)}
+            self._names = dict()
+            for member in self._state:
+                self._names.setdefault(os.path.basename(member['abspath']),
+                                       list()).append(member['uuid'])
 
     def _get_member(self, uuid):
         """Get all stored information on the specified member.
@@ -1125,12 +2329,40 @@ class Bundle(CollectionMixin):
                 a dictionary containing all information stored for the
                 specified member
         """
-        memberinfo = None
-        for member in self._state:
-            if member['uuid'] == uuid:
-                memberinfo = member
+        try:
+            return self._state[self._index[uuid]]
+        except KeyError:
+            return None
+
+    def _get_member_at(self, index):
+        """Get the stored record of the member at the given position.
+
+        :Arguments:
+            *index*
+                position of the member
+
+        :Returns:
+            *memberinfo*
+                a dictionary containing all information stored for the
+                member
+        """
+        return self._state[index]
+
+    def _get_members_named(self, name):
+        """Get the stored records of members with the given name.
+
+        :Arguments:
+            *name*
+                name of the members to retrieve information for
 
-        return memberinfo
+        :Returns:
+            *members*
+                list of dicts, one per member with the given name, in member
+                order
+        """
+        positions = sorted(self._index[uuid]
+                           for uuid in self._names.get(name, ()))
+        return [self._state[i] for i in positions]
 
     def _get_members(self):
         """Get full member table.
@@ -1151,6 +2383,16 @@ class Bundle(CollectionMixin):
 
         return out
 
+    def _get_member_records(self):
+        """Get the stored record for each member.
+
+        :Returns:
+            *members*
+                list of dicts, one per member in member order, with fields as
+                keys
+        """
+        return list(self._state)
+
     def _get_members_uuid(self):
         """List uuid for each member.
 
@@ -1161,13 +2403,14 @@ class Bundle(CollectionMixin):
         return [member['uuid'] for member in self._state]
 
     def _get_members_names(self):
-        """List uuid for each member.
+        """List name for each member.
 
         :Returns:
-            *uuids*
-                list giving treanttype of each member, in order
+            *names*
+                list giving name of each member, in order
         """
-        return [os.path.basename(member['abspath']) for member in self._state]
+        return [os.path.basename(member['abspath'])
+                for member in self._get_member_records()]
 
     def _get_members_treanttype(self):
         """List treanttype for each member.
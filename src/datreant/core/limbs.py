@@ -11,7 +11,7 @@ from collections import defaultdict
 from fuzzywuzzy import process
 
 from . import filesystem
-from .collections import Bundle
+from .collections import Bundle, MemberCache
 from . import _TREELIMBS, _LIMBS
 
 
@@ -593,9 +593,18 @@ class MemberBundle(Limb, Bundle):
                              "Treant '{}'".format(self._treant.filepath)))
 
         # member Treant cache
-        self._cache = dict()
+        self._cache = MemberCache()
         self._searchtime = 10
 
+    def __getstate__(self):
+        # membership lives in the Treant's state file
+        return {'treant': self._treant, 'searchtime': self._searchtime}
+
+    def __setstate__(self, state):
+        self._treant = state['treant']
+        self._cache = MemberCache()
+        self._searchtime = state['searchtime']
+
     def __set__(self, obj, val):
         """Setting with a Bundle will make membership match the Bundle.
 
@@ -656,9 +665,27 @@ class MemberBundle(Limb, Bundle):
                 list of abspaths
 
         """
+        location = self._treant.location
+
         with self._treant._write:
-            for uuid, treanttype, abspath in zip(uuids, treanttypes, abspaths):
-                self._add_member(uuid, treanttype, abspath)
+            members = self._treant._state['members']
+
+            # position of each existing member, by uuid
+            index = {member['uuid']: i for i, member in enumerate(members)}
+
+            for uuid, treanttype, basedir in zip(uuids, treanttypes,
+                                                 abspaths):
+                member_rec = {'uuid': uuid,
+                              'treanttype': treanttype,
+                              'abspath': os.path.abspath(basedir),
+                              'relpath': os.path.relpath(basedir, location)}
+
+                # check if uuid already present
+                try:
+                    members[index[uuid]] = member_rec
+                except KeyError:
+                    index[uuid] = len(members)
+                    members.append(member_rec)
 
     def _add_member(self, uuid, treanttype, basedir):
         """Add a member to the Group.
@@ -675,21 +702,7 @@ class MemberBundle(Limb, Bundle):
                 basedir of the new member in the filesystem
 
         """
-        member_rec = {'uuid': uuid,
-                      'treanttype': treanttype,
-                      'abspath': os.path.abspath(basedir),
-                      'relpath': os.path.relpath(
-                          basedir, self._treant.location)}
-
-        with self._treant._write:
-            # check if uuid already present
-            uuids = [member['uuid'] for member in
-                     self._treant._state['members']]
-
-            if uuid in uuids:
-                self._treant._state['members'][uuids.index(uuid)] = member_rec
-            else:
-                self._treant._state['members'].append(member_rec)
+        self._add_members([uuid], [treanttype], [basedir])
 
     def _del_members(self, uuids=None, all=False):
         """Remove members from the Group.
@@ -708,21 +721,9 @@ class MemberBundle(Limb, Bundle):
                 # remove redundant uuids from given list if present
                 uuids = set([str(uuid) for uuid in uuids])
 
-                # get matching rows
-                # TODO: possibly faster to use table.where
-                memberlist = list()
-                for i, member in enumerate(self._treant._state['members']):
-                    for uuid in uuids:
-                        if (member['uuid'] == uuid):
-                            memberlist.append(i)
-
-                memberlist.sort()
-                j = 0
-                # delete matching entries; have to use j to shift the register
-                # as we remove entries
-                for i in memberlist:
-                    self._treant._state['members'].pop(i - j)
-                    j = j + 1
+                self._treant._state['members'] = [
+                        member for member in self._treant._state['members']
+                        if member['uuid'] not in uuids]
 
     def _get_member(self, uuid):
         """Get all stored information on the specified member.
@@ -747,6 +748,37 @@ class MemberBundle(Limb, Bundle):
 
         return memberinfo
 
+    def _get_member_at(self, index):
+        """Get the stored record of the member at the given position.
+
+        :Arguments:
+            *index*
+                position of the member
+
+        :Returns:
+            *memberinfo*
+                a dictionary containing all information stored for the
+                member
+        """
+        with self._treant._read:
+            return self._treant._state['members'][index]
+
+    def _get_members_named(self, name):
+        """Get the stored records of members with the given name.
+
+        :Arguments:
+            *name*
+                name of the members to retrieve information for
+
+        :Returns:
+            *members*
+                list of dicts, one per member with the given name, in member
+                order
+        """
+        with self._treant._read:
+            return [member for member in self._treant._state['members']
+                    if os.path.basename(member['abspath']) == name]
+
     def _get_members(self):
         """Get full member table.
 
@@ -767,6 +799,17 @@ class MemberBundle(Limb, Bundle):
 
         return out
 
+    def _get_member_records(self):
+        """Get the stored record for each member.
+
+        :Returns:
+            *members*
+                list of dicts, one per member in member order, with fields as
+                keys
+        """
+        with self._treant._read:
+            return list(self._treant._state['members'])
+
     def _get_members_uuid(self):
         """List uuid for each member.
 
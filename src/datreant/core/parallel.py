@@ -0,0 +1,637 @@
+"""
+Worker pools for applying functions to the members of collections.
+
+A :class:`WorkerPool` keeps its worker processes between calls, so repeated
+calls to :meth:`Bundle.map <datreant.core.collections.Bundle.map>` or
+:meth:`View.map <datreant.core.collections.View.map>` with short tasks don't
+pay for pool startup each time.
+
+"""
+import os
+import sys
+import mmap
+import atexit
+import pickle
+import tempfile
+import functools
+import heapq
+import traceback
+import multiprocessing as mp
+from multiprocessing.pool import ThreadPool
+from collections import namedtuple
+from contextlib import contextmanager
+from timeit import default_timer as clock
+
+import six
+
+from . import _TREANTS
+from .trees import Leaf
+
+# most Treants each worker process keeps loaded between tasks
+WORKER_CACHESIZE = 1024
+
+# Treants loaded in this worker process, by state file path
+_WORKER_TREANTS = None
+
+# shared pools, by number of processes and whether threads; see `get_pool`
+_POOLS = dict()
+
+# where payloads shared with workers are written; memory-backed if possible
+_SHAREDIR = '/dev/shm' if os.path.isdir('/dev/shm') else None
+
+# payloads attached in this worker process, by file path
+_WORKER_SHARED = dict()
+
+
+def _load_treant(treanttype, filepath):
+    """Get a Treant in a worker process, reusing one loaded by an earlier task.
+
+    """
+    global _WORKER_TREANTS
+    if _WORKER_TREANTS is None:
+        from .collections import MemberCache
+        _WORKER_TREANTS = MemberCache(WORKER_CACHESIZE)
+
+    treant = _WORKER_TREANTS.get(filepath)
+    if treant is None:
+        # same as unpickling; no I/O until the Treant is used
+        treantclass = _TREANTS[treanttype]
+        treant = treantclass.__new__(treantclass)
+        treant.__setstate__(filepath)
+        _WORKER_TREANTS[filepath] = treant
+
+    return treant
+
+
+def _apply(function, kwargs, member):
+    """Apply a function to a member; used by :class:`WorkerPool`.
+
+    """
+    return function(member, **kwargs)
+
+
+def _apply_treant(function, member, **kwargs):
+    """Apply a function to a Treant given as (treanttype, filepath).
+
+    """
+    return function(_load_treant(*member), **kwargs)
+
+
+MapProgress = namedtuple('MapProgress',
+                         ['completed', 'total', 'member', 'seconds',
+                          'elapsed', 'throughput', 'utilization'])
+
+MapSummary = namedtuple('MapSummary',
+                        ['completed', 'total', 'workers', 'elapsed', 'busy',
+                         'overhead', 'utilization', 'throughput', 'slowest'])
+
+
+class MapMonitor(object):
+    """Progress and timing of a map over a collection.
+
+    Give as the `monitor` of :meth:`Bundle.map
+    <datreant.core.collections.Bundle.map>` and related methods. Each member's
+    wall time is measured where the function runs, in the worker.
+
+    Parameters
+    ----------
+    callback : function
+        Called with a :class:`MapProgress` each time a member is done, giving
+        members done and in total, the member's path and wall time in
+        seconds, time elapsed since the start, members done per second, and
+        the fraction of worker time spent in the function so far.
+    slowest : int
+        Number of slowest members to keep for :meth:`summary`.
+
+    """
+    def __init__(self, callback=None, slowest=10):
+        self.callback = callback
+        self.nslowest = slowest
+        self._start(0, 1)
+        self._end = self._begin
+
+    def __repr__(self):
+        return "<MapMonitor({}/{} done)>".format(self.completed, self.total)
+
+    def _start(self, total, workers):
+        self.total = total
+        self.workers = workers
+        self.completed = 0
+        self.busy = 0.0
+        self._slowest = list()
+        self._begin = clock()
+        self._end = None
+
+    def _record(self, member, seconds):
+        self.completed += 1
+        self.busy += seconds
+
+        entry = (seconds, member)
+        if len(self._slowest) < self.nslowest:
+            heapq.heappush(self._slowest, entry)
+        elif self._slowest and entry > self._slowest[0]:
+            heapq.heapreplace(self._slowest, entry)
+
+        if self.callback is not None:
+            elapsed = self.elapsed
+            self.callback(MapProgress(
+                self.completed, self.total, member, seconds, elapsed,
+                self.completed / elapsed if elapsed else 0.0,
+                self._utilization(elapsed)))
+
+    def _finish(self):
+        self._end = clock()
+
+    def _utilization(self, elapsed):
+        if not elapsed:
+            return 0.0
+        return min(self.busy / (elapsed * self.workers), 1.0)
+
+    @property
+    def elapsed(self):
+        """Wall time since the start, or of the whole run once done.
+
+        """
+        end = self._end if self._end is not None else clock()
+        return end - self._begin
+
+    def summary(self):
+        """Summarize the run.
+
+        Returns
+        -------
+        summary : MapSummary
+            namedtuple giving members done and in total; the number of
+            workers; wall time elapsed; time spent in the function, summed
+            over members (`busy`); worker time spent otherwise, such as on
+            dispatch, transfer of members and results, and waiting
+            (`overhead`); the fraction of worker time spent in the function;
+            members done per second; and the slowest members as
+            (path, seconds) pairs, slowest first
+
+        """
+        elapsed = self.elapsed
+        slowest = [(member, seconds) for seconds, member
+                   in sorted(self._slowest, reverse=True)]
+        return MapSummary(self.completed, self.total, self.workers, elapsed,
+                          self.busy,
+                          max(elapsed * self.workers - self.busy, 0.0),
+                          self._utilization(elapsed),
+                          self.completed / elapsed if elapsed else 0.0,
+                          slowest)
+
+
+class _Timed(object):
+    """Wraps a mapped function to also give the member's path and the wall
+    time spent on it.
+
+    """
+    def __init__(self, function):
+        self.function = function
+
+    def __call__(self, member, **kwargs):
+        start = clock()
+        result = self.function(member, **kwargs)
+        return result, member.abspath, clock() - start
+
+
+class MapFailure(object):
+    """A member for which a mapped function raised an exception.
+
+    Given in place of that member's result when mapping with
+    ``errors='collect'``.
+
+    Attributes
+    ----------
+    member : str
+        Absolute path of the member.
+    exception : Exception
+        The exception raised.
+    traceback : str
+        The formatted traceback, from the process that raised it.
+
+    """
+    def __init__(self, member, exception, traceback):
+        self.member = member
+        self.exception = exception
+        self.traceback = traceback
+
+    def __repr__(self):
+        return "<MapFailure('{}': {!r})>".format(self.member, self.exception)
+
+
+def checkpoint_path(member, name):
+    """Path of the file holding a member's saved result for checkpoint
+    `name`.
+
+    For Trees and Treants this is a hidden file in their directory; for
+    Leaves, a hidden file beside them.
+
+    """
+    abspath = member.abspath
+    if abspath.endswith(os.sep):
+        return os.path.join(abspath, '.{}.checkpoint'.format(name))
+
+    dirname, basename = os.path.split(abspath)
+    return os.path.join(dirname, '.{}.{}.checkpoint'.format(basename, name))
+
+
+def _save_checkpoint(member, name, result):
+    with Leaf(checkpoint_path(member, name)).atomic_writer('wb') as f:
+        pickle.dump(result, f, pickle.HIGHEST_PROTOCOL)
+
+
+def _load_checkpoint(member, name):
+    with open(checkpoint_path(member, name), 'rb') as f:
+        return pickle.load(f)
+
+
+def _failure(member, errors):
+    """Give the outcome for a member whose function just raised.
+
+    Must be called from within the ``except`` block.
+
+    """
+    if errors == 'raise':
+        raise
+    elif errors == 'skip':
+        return None
+    exc = sys.exc_info()[1]
+    return MapFailure(member.abspath, exc, traceback.format_exc())
+
+
+def _success(member, checkpoint, result):
+    if checkpoint is not None:
+        _save_checkpoint(member, checkpoint, result)
+    return result
+
+
+class _Guarded(object):
+    """Wraps a mapped function to handle its failures and save its results.
+
+    """
+    def __init__(self, function, errors='raise', checkpoint=None):
+        self.function = function
+        self.errors = errors
+        self.checkpoint = checkpoint
+
+    def __call__(self, member, **kwargs):
+        try:
+            result = self.function(member, **kwargs)
+        except Exception:
+            return _failure(member, self.errors)
+        return _success(member, self.checkpoint, result)
+
+
+def _fold(mapper, reducer, kwargs, members):
+    """Map each of a chunk of members, and reduce the results to one value.
+
+    """
+    members = iter(members)
+    result = mapper(next(members), **kwargs)
+    for member in members:
+        result = reducer(result, mapper(member, **kwargs))
+    return result
+
+
+def _reduce_pair(reducer, pair):
+    return reducer(*pair)
+
+
+class _Shared(object):
+    """Reference to a payload written to a file for workers to attach.
+
+    """
+    def __init__(self, path, kind, dtype=None, shape=None):
+        self.path = path
+        self.kind = kind
+        self.dtype = dtype
+        self.shape = shape
+
+
+def _share(payload):
+    """Write a payload to a file, giving a reference to it.
+
+    Bytes-like objects and NumPy arrays are written raw, so that workers can
+    memory-map them; anything else is pickled.
+
+    """
+    fd, path = tempfile.mkstemp(prefix='datreant-shared-', dir=_SHAREDIR)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            if isinstance(payload, (bytes, bytearray, memoryview)):
+                f.write(payload)
+                return _Shared(path, 'bytes')
+            elif (type(payload).__module__ == 'numpy' and
+                    hasattr(payload, 'tofile')):
+                if not payload.flags['C_CONTIGUOUS']:
+                    payload = payload.copy(order='C')
+                payload.tofile(f)
+                return _Shared(path, 'ndarray', payload.dtype, payload.shape)
+            else:
+                pickle.dump(payload, f, pickle.HIGHEST_PROTOCOL)
+                return _Shared(path, 'pickle')
+    except Exception:
+        os.remove(path)
+        raise
+
+
+def _attach(ref):
+    """Give the payload for a reference, mapping its file read-only.
+
+    """
+    if ref.kind == 'pickle':
+        with open(ref.path, 'rb') as f:
+            return pickle.load(f)
+
+    with open(ref.path, 'rb') as f:
+        if not os.fstat(f.fileno()).st_size:
+            data = b''
+        else:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    if ref.kind == 'ndarray':
+        import numpy as np
+        return np.frombuffer(data, dtype=ref.dtype).reshape(ref.shape)
+
+    # a memoryview can't be made of a mmap on Python 2; a buffer is the
+    # read-only, zero-copy equivalent there
+    if six.PY2:
+        return buffer(data)  # noqa: F821
+    return memoryview(data)
+
+
+class _WithShared(object):
+    """Wraps a mapped function to give it shared payloads as keyword
+    arguments, attaching each once per worker process.
+
+    """
+    def __init__(self, function, refs):
+        self.function = function
+        self.refs = refs
+
+    def __call__(self, member, **kwargs):
+        paths = set(ref.path for ref in self.refs.values())
+        # payloads from earlier calls are no longer needed
+        for path in set(_WORKER_SHARED) - paths:
+            del _WORKER_SHARED[path]
+
+        for name, ref in self.refs.items():
+            if ref.path not in _WORKER_SHARED:
+                _WORKER_SHARED[ref.path] = _attach(ref)
+            kwargs[name] = _WORKER_SHARED[ref.path]
+
+        return self.function(member, **kwargs)
+
+
+@contextmanager
+def sharing(function, shared):
+    """Give `function` wrapped to receive `shared` payloads in worker
+    processes.
+
+    Each payload is written once to a temporary file, memory-backed where
+    possible, which workers memory-map read-only: bytes-like objects are
+    given to the function as memoryviews (buffers on Python 2), and NumPy
+    arrays as read-only arrays, without copying. Other objects are pickled,
+    and unpickled once per worker. The files are removed on exit.
+
+    Parameters
+    ----------
+    function : function
+        Function to wrap.
+    shared : dict
+        Payloads, by the keyword they are given to `function` as.
+
+    """
+    if not shared:
+        yield function
+        return
+
+    refs = dict()
+    try:
+        for name, payload in shared.items():
+            refs[name] = _share(payload)
+        yield _WithShared(function, refs)
+    finally:
+        for ref in refs.values():
+            os.remove(ref.path)
+
+
+def _chunksize(n, processes):
+    """Choose a chunksize for `n` items over `processes` workers, as
+    :meth:`multiprocessing.pool.Pool.map` does.
+
+    """
+    chunksize, extra = divmod(n, processes * 4)
+    if extra:
+        chunksize += 1
+    return max(chunksize, 1)
+
+
+class WorkerPool(object):
+    """A pool of worker processes that persists between calls.
+
+    Processes are started on first use and kept until :meth:`close` is
+    called. Each worker keeps the Treants it has loaded between tasks. The
+    pool can also be used as a context manager, closing it on exit.
+
+    Note that worker processes only know of functions that existed when they
+    were started.
+
+    Parameters
+    ----------
+    processes : int
+        Number of worker processes; if ``None``, the number of CPUs.
+    threads : bool
+        If ``True``, use worker threads instead of processes; members are then
+        passed to functions as they are, without pickling.
+
+    """
+    def __init__(self, processes=None, threads=False):
+        self.processes = processes or mp.cpu_count()
+        self.threads = threads
+        self._pool = None
+
+    def __repr__(self):
+        return "<WorkerPool(processes={}, threads={})>".format(
+                self.processes, self.threads)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def _workers(self):
+        if self._pool is None:
+            if self.threads:
+                self._pool = ThreadPool(processes=self.processes)
+            else:
+                self._pool = mp.Pool(processes=self.processes)
+        return self._pool
+
+    def map(self, function, members, chunksize=None, **kwargs):
+        """Apply a function to each member, returning results in order.
+
+        Parameters
+        ----------
+        function : function
+            Function to apply to each member; `kwargs` are passed to it.
+        members : iterable
+            Members to apply the function to.
+        chunksize : int
+            Number of members sent to a worker at a time; if ``None``, chosen
+            from the number of members and processes.
+
+        Returns
+        -------
+        results : list
+            Result of the function for each member, in member order.
+
+        """
+        return self._workers.map(functools.partial(_apply, function, kwargs),
+                                 members, chunksize)
+
+    def imap(self, function, members, chunksize=1, **kwargs):
+        """Like :meth:`map`, but give results as they are done, in order.
+
+        """
+        return self._workers.imap(functools.partial(_apply, function, kwargs),
+                                  members, chunksize)
+
+    def imap_unordered(self, function, members, chunksize=1, **kwargs):
+        """Like :meth:`imap`, but give results in the order they are done.
+
+        """
+        return self._workers.imap_unordered(
+                functools.partial(_apply, function, kwargs), members,
+                chunksize)
+
+    def close(self):
+        """Stop the worker processes once they finish their tasks.
+
+        The pool starts new processes if used again.
+
+        """
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+    def terminate(self):
+        """Stop the worker processes immediately.
+
+        """
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+
+
+def imap_coroutines(function, members, workers=1, ordered=True,
+                    errors='raise', checkpoint=None, monitor=None, **kwargs):
+    """Apply a coroutine function to each member on an asyncio event loop.
+
+    At most `workers` calls run at any one time. The event loop is private
+    to this call. See :meth:`Bundle.map
+    <datreant.core.collections.Bundle.map>` for `errors`, `checkpoint` and
+    `monitor`.
+
+    Parameters
+    ----------
+    function : coroutine function
+        Function giving a coroutine for each member; `kwargs` are passed to
+        it.
+    members : iterable
+        Members to apply the function to.
+    workers : int
+        Most coroutines to run concurrently.
+    ordered : bool
+        If ``True``, give results in member order; if ``False``, give
+        them in the order they are done.
+
+    Returns
+    -------
+    results : iterator
+        Result of the function for each member.
+
+    """
+    import asyncio
+
+    loop = asyncio.new_event_loop()
+    members = iter(enumerate(members))
+    # running tasks, giving position and member for each
+    pending = dict()
+    done = dict()
+    position = 0
+    try:
+        while True:
+            # keep up to `workers` coroutines running
+            while len(pending) < max(workers, 1):
+                try:
+                    i, member = next(members)
+                except StopIteration:
+                    break
+                task = loop.create_task(function(member, **kwargs))
+                pending[task] = (i, member, clock())
+
+            if not pending:
+                break
+
+            finished, _ = loop.run_until_complete(
+                    asyncio.wait(list(pending),
+                                 return_when=asyncio.FIRST_COMPLETED))
+
+            for task in finished:
+                i, member, start = pending.pop(task)
+                if monitor is not None:
+                    monitor._record(member.abspath, clock() - start)
+                try:
+                    result = task.result()
+                except Exception:
+                    result = _failure(member, errors)
+                else:
+                    result = _success(member, checkpoint, result)
+
+                if ordered:
+                    done[i] = result
+                else:
+                    yield result
+
+            while position in done:
+                yield done.pop(position)
+                position += 1
+    finally:
+        for task in pending:
+            task.cancel()
+        if pending:
+            loop.run_until_complete(asyncio.wait(list(pending)))
+        loop.close()
+
+
+def get_pool(processes=None, threads=False):
+    """Get the shared :class:`WorkerPool` with the given number of processes.
+
+    The same pool is given for each call with the same arguments; all shared
+    pools are closed when the interpreter exits.
+
+    Parameters
+    ----------
+    processes : int
+        Number of worker processes; if ``None``, the number of CPUs.
+    threads : bool
+        If ``True``, get a pool of threads instead of processes.
+
+    """
+    key = (processes or mp.cpu_count(), threads)
+    if key not in _POOLS:
+        _POOLS[key] = WorkerPool(*key)
+    return _POOLS[key]
+
+
+@atexit.register
+def _close_pools():
+    for pool in _POOLS.values():
+        pool.terminate()
+    _POOLS.clear()
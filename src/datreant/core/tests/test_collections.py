@@ -2,9 +2,13 @@
 
 """
 
+import os
+import operator
+import pickle
 import pytest
 
 import datreant.core as dtr
+from datreant.core.collections import TreantHandle
 
 
 def do_stuff(cont):
@@ -15,6 +19,29 @@ def return_nothing(cont):
     b = cont.name + cont.uuid
 
 
+def name_list(cont, suffix=''):
+    return [cont.name + suffix]
+
+
+def read_shared(cont, payload=None, reference=None):
+    return bytes(bytearray(payload[:4])), reference['name'], len(cont.name)
+
+
+def sum_shared(cont, array=None):
+    return float(array.sum()), array.flags['WRITEABLE']
+
+
+def read_data(cont):
+    if cont['data.txt'].exists:
+        return cont['data.txt'].read()
+
+
+def fail_on(cont, name=None, tag=''):
+    if cont.name == name:
+        raise ValueError(cont.name)
+    return cont.name + tag
+
+
 class CollectionsTests:
     """Mixin tests for collections"""
     pass
@@ -30,6 +57,65 @@ class TestView:
     def test_exists(self, collection, tmpdir):
         pass
 
+    def test_ordered_set(self, collection, tmpdir):
+        with tmpdir.as_cwd():
+            moe, larry, curly = (dtr.Tree('moe'), dtr.Leaf('larry'),
+                                 dtr.Tree('curly'))
+
+            collection.add(curly, 'larry', moe)
+            collection.add([curly, dtr.Tree('moe')])
+            assert collection.abspaths == [curly.abspath, larry.abspath,
+                                           moe.abspath]
+
+            assert larry in collection
+            assert dtr.Leaf('larry') in collection
+            assert dtr.Tree('larry') not in collection
+            assert 'larry' not in collection
+
+            other = dtr.View(moe, dtr.Tree('shemp'), curly)
+
+            assert list(collection - other) == [larry]
+            assert list(collection - curly) == [larry, moe]
+            assert list(collection & other) == [curly, moe]
+            assert list(collection ^ other) == [larry, dtr.Tree('shemp')]
+            assert list(collection | other) == [curly, larry, moe,
+                                                dtr.Tree('shemp')]
+
+            assert collection == dtr.View(moe, curly, larry)
+            assert collection & other < collection
+
+    def test_hashes(self, collection, tmpdir):
+        import hashlib
+
+        with tmpdir.as_cwd():
+            t = dtr.Tree('moe')
+            t['larry'].write('curly')
+            leaf = dtr.Leaf('shemp').write('joe')
+
+            collection.add(t, leaf)
+
+            for processes in (1, 2):
+                assert collection.hashes(processes=processes) == {
+                    t['larry'].abspath: hashlib.sha256(b'curly').hexdigest(),
+                    leaf.abspath: hashlib.sha256(b'joe').hexdigest()}
+
+            # the Tree's digest cache is populated
+            assert '.hashes.json' in t.hidden.memberleaves.names
+
+    def test_write_many(self, collection, tmpdir):
+        with tmpdir.as_cwd():
+            data = {dtr.Leaf('a/moe'): 'larry',
+                    'b/curly': b'shemp',
+                    dtr.Leaf('joe'): 'curly joe'}
+
+            for processes in (1, 2):
+                v = collection.write_many(data, processes=processes)
+
+                assert len(v) == 3
+                assert dtr.Leaf('a/moe').read() == 'larry'
+                assert dtr.Leaf('b/curly').read() == 'shemp'
+                assert dtr.Leaf('joe').read() == 'curly joe'
+
 
 class TestBundle:
     """Tests for common elements of Group.members and Bundle"""
@@ -75,26 +161,108 @@ class TestBundle:
                     len(b) + len(testgroup.members))
             assert isinstance(b + testgroup.members, dtr.Bundle)
 
-    def test_subset(self, collection):
-        pass
-
-    def test_superset(self, collection):
-        pass
-
-    def test_difference(self, collection):
-        pass
-
-    def test_symmetric_difference(self, collection):
-        pass
-
-    def test_union(self, collection):
-        pass
-
-    def test_intersection(self, collection):
-        pass
-
-    def test_intersection(self, collection):
-        pass
+    @pytest.fixture
+    def stooges(self, collection, tmpdir):
+        """The collection with three members, none loaded, and a Bundle
+        overlapping it by two, likewise."""
+        with tmpdir.as_cwd():
+            t1 = dtr.Treant('larry')
+            t2 = dtr.Treant('curly')
+            t3 = dtr.Treant('moe')
+            t4 = dtr.Treant('shemp')
+
+        collection.add(t1, t2, t3)
+        collection._cache.clear()
+        other = dtr.Bundle(t4, t3, t2)
+        other._cache.clear()
+
+        return collection, other, [t1, t2, t3, t4]
+
+    def test_subset(self, stooges):
+        collection, other, (t1, t2, t3, t4) = stooges
+
+        assert dtr.Bundle(t3, t2) < collection
+        assert not collection < collection
+        assert collection <= collection
+        assert not other < collection
+        assert not other <= collection
+        assert collection == dtr.Bundle(t3, t2, t1)
+        assert not collection._cache
+
+    def test_superset(self, stooges):
+        collection, other, (t1, t2, t3, t4) = stooges
+
+        assert collection > dtr.Bundle(t2)
+        assert collection >= collection
+        assert not collection > other
+        assert not collection >= other
+        assert not collection._cache
+
+    def test_difference(self, stooges):
+        collection, other, (t1, t2, t3, t4) = stooges
+
+        assert (collection - other).uuids == [t1.uuid]
+        assert (collection - t2).uuids == [t1.uuid, t3.uuid]
+        assert (other - collection).uuids == [t4.uuid]
+        assert not collection._cache
+
+    def test_symmetric_difference(self, stooges):
+        collection, other, (t1, t2, t3, t4) = stooges
+
+        assert (collection ^ other).uuids == [t1.uuid, t4.uuid]
+        assert (other ^ collection).uuids == [t4.uuid, t1.uuid]
+        assert not collection._cache
+
+    def test_union(self, stooges):
+        collection, other, (t1, t2, t3, t4) = stooges
+
+        assert (collection | other).uuids == [t1.uuid, t2.uuid, t3.uuid,
+                                              t4.uuid]
+        assert (collection + other).uuids == [t1.uuid, t2.uuid, t3.uuid,
+                                              t4.uuid]
+        assert (collection + t4).uuids == [t1.uuid, t2.uuid, t3.uuid, t4.uuid]
+        assert not collection._cache
+
+    def test_intersection(self, stooges):
+        collection, other, (t1, t2, t3, t4) = stooges
+
+        result = collection & other
+        assert result.uuids == [t2.uuid, t3.uuid]
+        assert (other & collection).uuids == [t3.uuid, t2.uuid]
+        assert not collection._cache
+
+        # results share the cache of the left operand
+        result[0]
+        assert list(collection._cache) == [t2.uuid]
+
+    def test_sort_top_bottom(self, collection, tmpdir):
+        with tmpdir.as_cwd():
+            t1 = dtr.Treant('larry', categories={'score': 3})
+            t2 = dtr.Treant('curly')
+            t3 = dtr.Treant('moe', categories={'score': 7})
+            t4 = dtr.Treant('shemp', categories={'score': 5})
+            t5 = dtr.Treant('joe', categories={'score': 3})
+
+            collection.add(t1, t2, t3, t4, t5)
+
+            # ties keep member order, and members without a score go last
+            assert collection.sort_by('score').names == [
+                'larry', 'joe', 'shemp', 'moe', 'curly']
+            assert collection.sort_by('score', reverse=True).names == [
+                'moe', 'shemp', 'larry', 'joe', 'curly']
+
+            assert collection.top(2, 'score').names == ['moe', 'shemp']
+            assert collection.bottom(3, 'score').names == [
+                'larry', 'joe', 'shemp']
+            assert collection.top(5, 'score').names == collection.sort_by(
+                'score', reverse=True).names
+            assert collection.bottom(10, 'score').names == [
+                'larry', 'joe', 'shemp', 'moe', 'curly']
+
+            assert collection.sort_by(lambda m: len(m.name)).names == [
+                'moe', 'joe', 'larry', 'curly', 'shemp']
+            assert collection.top(1, lambda m: m.name).names == ['shemp']
+            assert isinstance(collection.top(1, 'score'), dtr.Bundle)
 
     def test_add_members(self, collection, tmpdir):
         """Try adding members in a number of ways"""
@@ -153,11 +321,227 @@ class TestBundle:
     def test_fancy_index(self, collection):
         pass
 
-    def test_name_index(self, collection):
-        pass
+    def test_name_index(self, collection, tmpdir):
+        with tmpdir.as_cwd():
+            t1 = dtr.Treant('a/larry')
+            t2 = dtr.Treant('curly')
+            t3 = dtr.Treant('b/larry')
 
-    def test_uuid_index(self, collection):
-        pass
+            collection.add(t1, t2, t3)
+
+            # names give Bundles, in member order
+            assert collection['larry'].uuids == [t1.uuid, t3.uuid]
+            assert collection['curly'].uuids == [t2.uuid]
+
+            # members re-added from a new location are found by their new name
+            t1.location = 'elsewhere'
+            t1.name = 'moe'
+            collection.add(t1)
+            assert collection['larry'].uuids == [t3.uuid]
+            assert collection['moe'].uuids == [t1.uuid]
+
+            collection.remove(t3)
+            with pytest.raises(KeyError):
+                collection['larry']
+
+    def test_uuid_index(self, collection, tmpdir):
+        with tmpdir.as_cwd():
+            t1 = dtr.Treant('larry')
+            t2 = dtr.Treant('curly')
+            t3 = dtr.Treant('moe')
+
+            collection.add(t1, t2, t3)
+
+            assert collection[t2.uuid] == t2
+            assert t2.uuid in collection
+
+            collection.remove(t1, t2)
+            assert t2.uuid not in collection
+            assert collection[t3.uuid] == t3
+            assert collection.uuids == [t3.uuid]
+
+            with pytest.raises(KeyError):
+                collection[t1.uuid]
+
+    def test_metadata_without_loading(self, collection, tmpdir):
+        """Member metadata and sub-Bundles come from records alone"""
+        with tmpdir.as_cwd():
+            t1 = dtr.Treant('larry')
+            t2 = dtr.Treant('curly')
+            t3 = dtr.Treant('moe')
+
+            collection.add(t1, t2, t3)
+            collection._cache.clear()
+
+            assert len(collection) == 3
+            assert collection.names == ['larry', 'curly', 'moe']
+            assert collection.abspaths == [t1.abspath, t2.abspath, t3.abspath]
+            assert collection.relpaths == [t1.relpath, t2.relpath, t3.relpath]
+            assert collection.filepaths == [t1.filepath, t2.filepath,
+                                            t3.filepath]
+
+            sub = collection[1:]
+            assert sub.uuids == [t2.uuid, t3.uuid]
+            assert collection['moe'].uuids == [t3.uuid]
+            assert collection[[True, False, True]].names == ['larry', 'moe']
+            assert not collection._cache
+            assert not sub._cache
+
+            assert collection[1] == t2
+            assert list(collection._cache) == [t2.uuid]
+
+    def test_member_handles(self, collection, tmpdir):
+        """Members not yet loaded are given as handles"""
+        with tmpdir.as_cwd():
+            t1 = dtr.Treant('larry', tags=['stooge'])
+            t2 = dtr.Treant('curly')
+
+            collection.add(t1, t2)
+            collection._cache.clear()
+
+            h1, h2 = list(collection)
+            assert isinstance(h1, TreantHandle)
+            assert h1 == t1
+            assert h1.name == 'larry'
+            assert h1.abspath == t1.abspath
+            assert h1.filepath == t1.filepath
+            assert not collection._cache
+
+            # limb access loads the member, which the Bundle then keeps
+            assert 'stooge' in h1.tags
+            assert list(collection._cache) == [t1.uuid]
+            assert list(collection)[0] is h1._treant
+
+            # special methods work on handles as on Treants
+            t2['data.txt'].write('moe')
+            collection._cache.clear()
+            h1, h2 = list(collection)
+            assert h2['data.txt'].read() == 'moe'
+            assert t2['data.txt'] in h2
+            assert isinstance(h1 + h2, dtr.Bundle)
+            assert str(h2) == str(t2)
+
+            # mapped functions get Treants, not handles
+            collection._cache.clear()
+            for backend in ('processes', 'threads'):
+                assert collection.map(read_data, backend=backend) == [
+                    None, 'moe']
+                assert collection.map(read_data, processes=2,
+                                      backend=backend) == [None, 'moe']
+
+            h3 = pickle.loads(pickle.dumps(h2))
+            assert h3 == t2
+            assert h3.treanttype == 'Treant'
+            assert h3.uuid == t2.uuid
+
+            b = dtr.Bundle(h2)
+            assert b.uuids == [t2.uuid]
+            collection.remove(h2)
+            assert collection.uuids == [t1.uuid]
+
+    def test_member_cache(self, collection, tmpdir):
+        """Loaded members are kept in a bounded LRU cache"""
+        with tmpdir.as_cwd():
+            t1 = dtr.Treant('larry')
+            t2 = dtr.Treant('curly')
+            t3 = dtr.Treant('moe')
+
+            collection.add(t1, t2, t3)
+            collection._cache.clear()
+            collection.cachesize = 2
+            assert collection.cachesize == 2
+
+            collection[0], collection[1], collection[2]
+            info = collection.cache_info()
+            assert info.currsize == 2
+            assert info.evictions == 1
+            assert list(collection._cache) == [t2.uuid, t3.uuid]
+
+            collection[1]
+            assert collection.cache_info().hits == info.hits + 1
+            assert list(collection._cache) == [t3.uuid, t2.uuid]
+
+            # sub-Bundles share the cache
+            sub = collection[:2]
+            assert sub._cache is collection._cache
+
+            collection.cachesize = 1
+            assert list(collection._cache) == [t2.uuid]
+
+            with pytest.raises(TypeError):
+                collection.cachesize = 'all'
+
+    def test_weak_member_cache(self, tmpdir):
+        with tmpdir.as_cwd():
+            b = dtr.Bundle(dtr.Treant('larry'), weakcache=True)
+            b._cache.clear()
+
+            t = b[0]
+            assert list(b._cache) == [t.uuid]
+
+            del t
+            import gc
+            gc.collect()
+            assert not len(b._cache)
+            assert b.cachesize is None
+
+    def test_pickle(self, collection, tmpdir):
+        """Bundles pickle as member records only"""
+        with tmpdir.as_cwd():
+            t1 = dtr.Treant('larry')
+            t2 = dtr.Group('curly')
+
+            collection.add(t1, t2)
+            collection.searchtime = 5
+            collection[0], collection[1]
+
+            b = pickle.loads(pickle.dumps(collection))
+            assert b.uuids == [t1.uuid, t2.uuid]
+            assert b.abspaths == [t1.abspath, t2.abspath]
+            assert b.searchtime == 5
+            assert not len(b._cache)
+            assert b[1] == t2
+
+    def test_save_load(self, collection, tmpdir):
+        """Bundles reload from a manifest, finding moved members on use"""
+        with tmpdir.as_cwd():
+            t1 = dtr.Treant('larry')
+            t2 = dtr.Group('curly')
+
+            collection.add(t1, t2)
+            collection.searchtime = 5
+            manifest = collection.save('members.json')
+            assert manifest.exists
+
+            t1.location = 'elsewhere'
+
+            b = dtr.Bundle.load('members.json')
+            assert isinstance(b, dtr.Bundle)
+            assert b.uuids == [t1.uuid, t2.uuid]
+            assert b.searchtime == 5
+            assert not len(b._cache)
+
+            assert b[0] == t1
+            assert b.abspaths[0] == t1.abspath
+
+            # manifests can be given as Leaves too
+            leaf = dtr.Leaf('manifests/members.json')
+            assert collection.save(leaf) == leaf
+            assert dtr.Bundle.load(leaf).uuids == collection.uuids
+
+    def test_readd_member(self, collection, tmpdir):
+        """Re-adding a member keeps its position but updates its location"""
+        with tmpdir.as_cwd():
+            t1 = dtr.Treant('larry')
+            t2 = dtr.Treant('curly')
+
+            collection.add(t1, t2)
+
+            t1.location = 'elsewhere'
+            collection.add(t1, t2)
+
+            assert collection.uuids == [t1.uuid, t2.uuid]
+            assert collection[0].abspath == t1.abspath
 
     def test_remove_members(self, collection, tmpdir):
         """Try removing members"""
@@ -247,6 +631,292 @@ class TestBundle:
         assert collection.map(return_nothing) is None
         assert collection.map(return_nothing, processes=2) is None
 
+    def test_map_moved(self, collection, tmpdir):
+        """Members that moved are found before going to worker processes"""
+        with tmpdir.as_cwd():
+            t1 = dtr.Treant('lark')
+            t2 = dtr.Treant('hark')
+            collection.add(t1, t2)
+            collection.save('members.json')
+            collection._cache.clear()
+
+            t2.location = 'elsewhere'
+
+            assert collection.map(do_stuff, processes=2) == [
+                do_stuff(t1), do_stuff(t2)]
+            assert collection.abspaths[1] == t2.abspath
+
+            loaded = dtr.Bundle.load('members.json')
+            assert loaded.mapreduce(do_stuff, operator.add,
+                                    processes=2) == do_stuff(t1) + do_stuff(t2)
+
+    def test_map_pool(self, collection, tmpdir):
+        from datreant.core.parallel import WorkerPool, get_pool
+
+        with tmpdir.as_cwd():
+            collection.add(dtr.Treant('lark'), dtr.Treant('hark'),
+                           dtr.Group('linus'))
+
+        comp = [cont.name + cont.uuid for cont in collection]
+        assert list(collection.imap(do_stuff)) == comp
+
+        with WorkerPool(2) as pool:
+            for chunksize in (None, 1, 2):
+                assert collection.map(do_stuff, pool=pool,
+                                      chunksize=chunksize) == comp
+            assert list(collection.imap(do_stuff, pool=pool)) == comp
+            assert sorted(collection.imap(do_stuff, pool=pool,
+                                          ordered=False)) == sorted(comp)
+
+        assert list(collection.imap(do_stuff, processes=2)) == comp
+        assert get_pool(2) is get_pool(2)
+
+        # workers reuse the Treants they load
+        from datreant.core.parallel import _load_treant
+        t = collection[0]
+        loaded = _load_treant(t.treanttype, t.filepath)
+        assert loaded == t
+        assert _load_treant(t.treanttype, t.filepath) is loaded
+
+    def test_map_backends(self, collection, tmpdir):
+        with tmpdir.as_cwd():
+            collection.add(dtr.Treant('lark'), dtr.Treant('hark'),
+                           dtr.Group('linus'))
+
+        comp = [cont.name + cont.uuid for cont in collection]
+
+        # threads need no pickling
+        assert collection.map(lambda t: t.name + t.uuid, backend='threads',
+                              workers=2) == comp
+
+        asyncio = pytest.importorskip('asyncio')
+
+        def sleepy(treant, delay=0):
+            return asyncio.sleep(delay, result=treant.name + treant.uuid)
+
+        for workers in (1, 2, 5):
+            assert collection.map(sleepy, backend='asyncio',
+                                  workers=workers) == comp
+        assert sorted(collection.imap(sleepy, backend='asyncio', workers=2,
+                                      ordered=False, delay=0.01)) == \
+            sorted(comp)
+
+        with pytest.raises(ValueError):
+            collection.map(do_stuff, backend='fibers')
+
+        # bad arguments are caught before iterating over results
+        with pytest.raises(ValueError):
+            collection.imap(do_stuff, backend='fibers')
+        with pytest.raises(ValueError):
+            collection.imap(do_stuff, errors='ignore')
+
+    def test_map_errors(self, collection, tmpdir):
+        from datreant.core.parallel import MapFailure
+
+        with tmpdir.as_cwd():
+            collection.add(dtr.Treant('lark'), dtr.Treant('hark'),
+                           dtr.Group('linus'))
+
+        for processes in (1, 2):
+            with pytest.raises(ValueError):
+                collection.map(fail_on, processes=processes, name='hark')
+
+            assert collection.map(fail_on, processes=processes, name='hark',
+                                  errors='skip') == ['lark', None, 'linus']
+
+            results = collection.map(fail_on, processes=processes,
+                                     name='hark', errors='collect')
+            assert results[::2] == ['lark', 'linus']
+            assert isinstance(results[1], MapFailure)
+            assert isinstance(results[1].exception, ValueError)
+            assert results[1].member == collection[1].abspath
+            assert 'ValueError' in results[1].traceback
+
+        with pytest.raises(ValueError):
+            collection.map(do_stuff, errors='ignore')
+
+    def test_map_checkpoint(self, collection, tmpdir):
+        from datreant.core.parallel import checkpoint_path
+
+        with tmpdir.as_cwd():
+            collection.add(dtr.Treant('lark'), dtr.Treant('hark'),
+                           dtr.Group('linus'))
+
+        for processes, name in ((1, 'serial'), (2, 'parallel')):
+            assert collection.map(fail_on, processes=processes, name='hark',
+                                  tag='-first', errors='skip',
+                                  checkpoint=name) == [
+                'lark-first', None, 'linus-first']
+
+            # only the failed member is rerun
+            assert collection.map(fail_on, processes=processes,
+                                  tag='-second', checkpoint=name) == [
+                'lark-first', 'hark-second', 'linus-first']
+            assert os.path.exists(checkpoint_path(collection[1], name))
+
+            assert sorted(collection.imap(fail_on, tag='-third',
+                                          checkpoint=name, ordered=False)) \
+                == ['hark-second', 'lark-first', 'linus-first']
+
+    def test_mapreduce(self, collection, tmpdir):
+        import operator
+        from datreant.core.parallel import WorkerPool
+
+        assert collection.mapreduce(name_list, operator.add, []) == []
+
+        with tmpdir.as_cwd():
+            collection.add(dtr.Treant('lark'), dtr.Treant('hark'),
+                           dtr.Group('linus'), dtr.Treant('bark'),
+                           dtr.Treant('mark'))
+
+        names = collection.names
+        for processes in (1, 2):
+            for chunksize in (None, 1, 2):
+                for tree in (False, True):
+                    assert collection.mapreduce(
+                        name_list, operator.add, processes=processes,
+                        chunksize=chunksize, tree=tree) == names
+
+        assert collection.mapreduce(
+            name_list, operator.add, initializer=['shark'], processes=2,
+            suffix='!') == ['shark'] + [name + '!' for name in names]
+
+        with WorkerPool(2, threads=True) as pool:
+            assert collection.mapreduce(lambda t: [t.name], operator.add,
+                                        pool=pool, tree=True) == names
+
+    def test_map_shared(self, collection, tmpdir):
+        import glob
+        import tempfile
+        import operator
+        from datreant.core import parallel
+
+        with tmpdir.as_cwd():
+            collection.add(dtr.Treant('lark'), dtr.Treant('hark'))
+
+        sharedir = parallel._SHAREDIR or tempfile.gettempdir()
+        before = set(glob.glob(os.path.join(sharedir, 'datreant-shared-*')))
+
+        payload = b'moon' * 1000
+        reference = {'name': 'stars'}
+        comp = [(b'moon', 'stars', 4)] * 2
+        for processes in (1, 2):
+            assert collection.map(read_shared, processes=processes,
+                                  shared={'payload': payload,
+                                          'reference': reference}) == comp
+        assert collection.map(read_shared, backend='threads', workers=2,
+                              shared={'payload': payload},
+                              reference=reference) == comp
+        assert collection.mapreduce(
+            read_shared, operator.add, processes=2,
+            shared={'payload': payload, 'reference': reference}) == \
+            comp[0] + comp[1]
+
+        assert set(glob.glob(os.path.join(sharedir,
+                                          'datreant-shared-*'))) == before
+
+    def test_map_shared_array(self, collection, tmpdir):
+        np = pytest.importorskip('numpy')
+
+        with tmpdir.as_cwd():
+            collection.add(dtr.Treant('lark'), dtr.Treant('hark'))
+
+        array = np.arange(12, dtype=float).reshape(3, 4)
+        assert collection.map(sum_shared, processes=2,
+                              shared={'array': array.T}) == [(66.0, False)] * 2
+
+    def test_map_monitor(self, collection, tmpdir):
+        from datreant.core.parallel import MapMonitor
+
+        with tmpdir.as_cwd():
+            collection.add(dtr.Treant('lark'), dtr.Treant('hark'),
+                           dtr.Group('linus'))
+
+        comp = [cont.name + cont.uuid for cont in collection]
+        for kwargs in ({}, {'processes': 2},
+                       {'backend': 'threads', 'workers': 2}):
+            events = []
+            monitor = MapMonitor(events.append, slowest=2)
+            assert collection.map(do_stuff, monitor=monitor, **kwargs) == comp
+
+            assert [event.completed for event in events] == [1, 2, 3]
+            assert set(event.total for event in events) == {3}
+            assert (sorted(event.member for event in events) ==
+                    sorted(collection.abspaths))
+            assert all(0 <= event.utilization <= 1 for event in events)
+
+            summary = monitor.summary()
+            assert summary.completed == summary.total == 3
+            assert summary.workers == kwargs.get('workers',
+                                                 kwargs.get('processes', 1))
+            assert summary.busy <= summary.elapsed * summary.workers
+            assert len(summary.slowest) == 2
+            assert summary.slowest[0][1] >= summary.slowest[1][1]
+            assert summary.throughput > 0
+
+    def test_diff(self, collection, tmpdir):
+        with tmpdir.as_cwd():
+            t1 = dtr.Treant('scratch/lark')
+            t2 = dtr.Treant('scratch/hark')
+            t1['data'].write('stars')
+            t2['data'].write('moon')
+
+            collection.add(t1, t2)
+
+            archive = dtr.Tree('archive')
+            archive['lark/data'].write('stars')
+            archive['hark/data'].write('sun')
+            archive['hark/log'].write('done')
+
+            for processes in (1, 2):
+                d1, d2 = collection.diff(archive, processes=processes)
+
+                assert d1.added == []
+                assert d1.modified == []
+                assert d1.removed == [os.path.basename(t1.filepath)]
+
+                assert d2.added == ['log']
+                assert d2.modified == ['data']
+
+    def test_copy(self, collection, tmpdir):
+        with tmpdir.as_cwd():
+            t1 = dtr.Treant('scratch/lark', tags=['bird'])
+            t2 = dtr.Group('scratch/hark')
+            t1['data'].write('stars')
+
+            collection.add(t1, t2)
+
+            b = collection.copy('archive', processes=2)
+            assert b.uuids == collection.uuids
+            assert b.abspaths == [os.path.abspath(os.path.join('archive', n))
+                                  + os.sep for n in ('lark', 'hark')]
+            assert b[0]['data'].read() == 'stars'
+            assert 'bird' in b[0].tags
+            assert isinstance(b[1], dtr.Group)
+
+            b = collection.copy('fresh', link='hard', newuuids=True)
+            assert not set(b.uuids) & set(collection.uuids)
+            assert b.treanttypes == collection.treanttypes
+            assert b[0]['data'].read() == 'stars'
+            for uuid in collection.uuids:
+                assert not [name for name in b[0].hidden.names
+                            if uuid in name]
+
+            # refreshing keeps the new uuids, with one state file each
+            t1.tags.add('lark')
+            again = collection.copy('fresh', newuuids=True)
+            assert again.uuids == b.uuids
+            assert 'lark' in again[0].tags
+            for copy in again:
+                assert len(dtr.filesystem.glob_treant(copy.abspath)) == 1
+
+            # members with the same name would share a directory
+            t3 = dtr.Treant('elsewhere/lark')
+            collection.add(t3)
+            with pytest.raises(ValueError):
+                collection.copy('clash')
+            assert not os.path.exists('clash')
+
     def test_flatten(self, collection, tmpdir):
         """Test that flattening a collection of Treants and Groups works as
         expected.
@@ -288,6 +958,30 @@ class TestBundle:
             assert len(collection.flatten([g.uuid])) == 1
             assert 'mark' in collection.flatten([g.uuid]).names
 
+    def test_flatten_nested(self, collection, tmpdir):
+        """Test flattening Groups within Groups, including cycles"""
+        with tmpdir.as_cwd():
+            outer = dtr.Group('outer')
+            inner = dtr.Group('inner')
+            lark, mark, bark = [dtr.Treant(name)
+                                for name in ('lark', 'mark', 'bark')]
+
+            inner.members.add(mark, bark, outer)
+            outer.members.add(inner, lark, mark)
+            collection.add(outer, bark)
+
+            b = collection.flatten()
+            assert b.names == ['bark', 'lark', 'mark']
+
+            handles = list(collection.iterflatten())
+            assert all(isinstance(h, TreantHandle) for h in handles)
+            assert [h.name for h in handles] == ['bark', 'lark', 'mark']
+            assert handles[1] == lark
+
+            assert collection.flatten([inner.uuid]).names == [
+                'bark', 'lark', 'mark']
+            assert collection.flatten([outer.uuid]).names == ['bark']
+
     class TestAggTags:
         """Test behavior of manipulating tags collectively.
 
@@ -628,6 +1322,37 @@ class TestBundle:
                         assert v == collection.categories[
                                 collection.categories.keys(scope=scope)[i]]
 
+        def test_categories_one_read(self, collection, testtreant, testgroup,
+                                     tmpdir, monkeypatch):
+            with tmpdir.as_cwd():
+                collection.add(testtreant, testgroup)
+                collection.categories.add({'age': 42, 'bark': 'smooth'})
+                testgroup.categories['type'] = 'evergreen'
+
+                reads = []
+                read = dtr.limbs.Categories._dict
+
+                def counting(self):
+                    reads.append(self._treant.uuid)
+                    return read(self)
+
+                monkeypatch.setattr(dtr.limbs.Categories, '_dict', counting)
+
+                for access in (
+                        lambda c: c['age'],
+                        lambda c: c[['age', 'bark', 'type']],
+                        lambda c: c[{'age', 'type'}],
+                        lambda c: c.any,
+                        lambda c: c.all,
+                        lambda c: c.keys(scope='any'),
+                        lambda c: c.values(scope='all')):
+                    del reads[:]
+                    access(collection.categories)
+                    assert sorted(reads) == sorted(collection.uuids)
+
+                assert collection.categories[['age', 'type']] == [
+                    [42, 42], [None, 'evergreen']]
+
         def test_categories_groupby(self, collection, testtreant, testgroup,
                                     tmpdir):
             with tmpdir.as_cwd():
@@ -742,3 +1467,27 @@ class TestBundle:
                 assert len(health_nick) == 0
                 for bundle in health_nick.values():
                     assert {t1, t2, t3, t4}.isdisjoint(set(bundle))
+
+        def test_categories_groupby_map_agg(self, collection, tmpdir):
+            with tmpdir.as_cwd():
+                t1 = dtr.Treant('maple', categories={'type': 'deciduous'})
+                t2 = dtr.Treant('sequoia', categories={'type': 'evergreen'})
+                t3 = dtr.Treant('elm', categories={'type': 'deciduous'})
+                t4 = dtr.Treant('oak')
+                collection.add(t1, t2, t3, t4)
+
+                groups = collection.categories.groupby('type')
+                assert isinstance(groups, dtr.agglimbs.GroupBy)
+                assert groups['deciduous'].names == ['maple', 'elm']
+
+                for processes in (1, 2):
+                    assert groups.map(do_stuff, processes=processes) == {
+                        'deciduous': [do_stuff(t1), do_stuff(t3)],
+                        'evergreen': [do_stuff(t2)]}
+
+                # other backends are respected; threads take lambdas
+                assert groups.map(lambda m: m.name, processes=2,
+                                  backend='threads') == {
+                    'deciduous': ['maple', 'elm'], 'evergreen': ['sequoia']}
+
+                assert groups.agg(len) == {'deciduous': 2, 'evergreen': 1}
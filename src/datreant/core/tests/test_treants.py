@@ -11,6 +11,16 @@ from . import test_collections
 from .test_trees import TestTree
 
 
+class Sim(dtr.Treant):
+    """A Treant subclass with its own signature."""
+    _treanttype = 'Sim'
+
+    def __init__(self, sim, temperature=None):
+        super(Sim, self).__init__(sim)
+        if temperature is not None:
+            self.categories['temperature'] = temperature
+
+
 class TestTreant(TestTree):
     """Test generic Treant features"""
     treantname = 'testtreant'
@@ -163,6 +173,106 @@ class TestTreant(TestTree):
         assert c1 <= c2 < c3
         assert c3 >= c2 > c1
 
+    def test_location_across_devices(self, treant, tmpdir, monkeypatch):
+        """Test that moving a Treant falls back to copying when renaming
+        across filesystems isn't possible"""
+        import errno
+
+        treant['data/stars'].write('moon')
+        uuid = treant.uuid
+
+        tmpdir.join('ext/data/sun').write('star', ensure=True)
+        os.symlink(tmpdir.join('ext/data').strpath,
+                   os.path.join(treant.abspath, 'datalink'))
+        os.symlink(tmpdir.join('nowhere').strpath,
+                   os.path.join(treant.abspath, 'dangling'))
+
+        def rename(src, dst, _rename=os.rename):
+            if os.path.isdir(src):
+                raise OSError(errno.EXDEV, 'Invalid cross-device link')
+            return _rename(src, dst)
+
+        monkeypatch.setattr(os, 'rename', rename)
+
+        oldpath = treant.abspath
+        treant.location = tmpdir.join('elsewhere').strpath
+
+        assert not os.path.exists(oldpath)
+        assert treant.location == tmpdir.join('elsewhere').strpath
+        assert treant.uuid == uuid
+        assert treant['data/stars'].read() == 'moon'
+
+        # symlinks are moved as they are, dangling or not
+        assert os.readlink(os.path.join(treant.abspath, 'datalink')) == (
+            tmpdir.join('ext/data').strpath)
+        assert os.readlink(os.path.join(treant.abspath, 'dangling')) == (
+            tmpdir.join('nowhere').strpath)
+        assert tmpdir.join('ext/data/sun').read() == 'star'
+
+    def test_pickle(self, treant, tmpdir):
+        """Test that Treants pickle as their state file, and unpickle without
+        touching the filesystem"""
+        import pickle
+        import shutil
+
+        treant.tags.add('fluffy')
+        data = pickle.dumps(treant)
+
+        t = pickle.loads(data)
+        assert t == treant
+        assert type(t) is type(treant)
+        assert 'fluffy' in t.tags
+
+        shutil.rmtree(treant.abspath)
+        t = pickle.loads(data)
+        assert t.filepath == treant.filepath
+        assert not os.path.exists(treant.abspath)
+
+    def test_identity_map(self, treant, treantclass, tmpdir, request):
+        """Test that Treants for the same state file are shared when the
+        identity map is enabled"""
+        assert treantclass(treant.abspath) is not treant
+
+        dtr.treants.identity_map()
+        request.addfinalizer(lambda: dtr.treants.identity_map(False))
+
+        with tmpdir.as_cwd():
+            t1 = treantclass(treant.abspath)
+            assert treantclass(treant.abspath) is t1
+            assert treantclass(t1.filepath) is t1
+            assert treantclass(dtr.Tree(t1.abspath)) is t1
+
+            t2 = treantclass(t1.abspath, tags=['plain'])
+            assert t2 is t1
+            assert 'plain' in t1.tags
+
+            b = dtr.Bundle(t1.abspath)
+            b._cache.clear()
+            assert b[0] is t1
+
+            t1.location = 'elsewhere'
+            assert treantclass(t1.abspath) is t1
+            assert treantclass(t1.abspath, new=True) is not t1
+
+        dtr.treants.identity_map(False)
+        assert treantclass(t1.filepath) is not t1
+
+    def test_subclass_signature(self, tmpdir, request):
+        """Test that Treant subclasses can name their own arguments, with or
+        without the identity map"""
+        with tmpdir.as_cwd():
+            s1 = Sim(sim='sim', temperature=300)
+            assert s1.categories['temperature'] == 300
+            assert Sim(sim='sim') is not s1
+
+            dtr.treants.identity_map()
+            request.addfinalizer(lambda: dtr.treants.identity_map(False))
+
+            s2 = Sim(sim='sim')
+            assert s2.uuid == s1.uuid
+            assert Sim('sim') is s2
+            assert Sim('sim', temperature=310) is not s2
+
     class TestTags:
         """Test treant tags"""
 
@@ -388,6 +498,82 @@ class TestGroup(TestTreant):
     def test_repr(self, treant):
         pass
 
+    def test_member_loading_writes(self, treant, tmpdir):
+        """Loading members rewrites the Group's state only for moved ones"""
+        with tmpdir.as_cwd():
+            members = [dtr.Treant(name) for name in ('lark', 'mark', 'bark')]
+        treant.members.add(*members)
+        treant.members._cache.clear()
+
+        inode = os.stat(treant.filepath).st_ino
+        assert [len(member.tags) for member in treant.members] == [0, 0, 0]
+        assert treant.members.categories.keys() == []
+        assert os.stat(treant.filepath).st_ino == inode
+
+        members[1].location = tmpdir.join('elsewhere').strpath
+        treant.members._cache.clear()
+        assert treant.members[1] == members[1]
+        assert os.stat(treant.filepath).st_ino != inode
+        assert treant.members.abspaths[1] == members[1].abspath
+
+    def test_membership_graph(self, treant, tmpdir, monkeypatch):
+        with tmpdir.as_cwd():
+            t1 = dtr.Treant('t1')
+            t2 = dtr.Treant('t2')
+            sub = dtr.Group('sub')
+            subsub = dtr.Group('subsub')
+
+        treant.members.add(t1, sub)
+        sub.members.add(t2, subsub)
+        subsub.members.add(t1, treant)
+
+        assert treant.contains_deep(t2)
+        assert treant.contains_deep(subsub.uuid)
+        assert not sub.contains_deep(dtr.Treant(tmpdir.join('t3').strpath))
+
+        # cycles are followed once; the root itself is not a descendant
+        assert (treant.descendants().uuids ==
+                [t1.uuid, sub.uuid, t2.uuid, subsub.uuid])
+        assert set(subsub.descendants().uuids) == set(
+            [t1.uuid, treant.uuid, sub.uuid, t2.uuid])
+
+        assert t1.groups_containing(treant).uuids == [
+            treant.uuid, subsub.uuid, sub.uuid]
+        assert t2.groups_containing(dtr.Bundle(sub)).uuids == [
+            sub.uuid, treant.uuid, subsub.uuid]
+        assert treant.groups_containing(treant).uuids == [
+            subsub.uuid, sub.uuid, treant.uuid]
+
+        # unchanged Groups aren't read again; changed ones are
+        reads = []
+        read = dtr.treants.treantfile
+
+        def counting(statefile):
+            reads.append(statefile)
+            return read(statefile)
+
+        monkeypatch.setattr(dtr.treants, 'treantfile', counting)
+        treant.descendants()
+        assert reads == []
+
+        sub.members.remove(subsub)
+        assert treant.contains_deep(t2)
+        assert reads == [sub.filepath]
+        assert not sub.contains_deep(treant)
+
+        # records for Groups that are gone are dropped, and the cache is
+        # bounded, least recently used first
+        cache = dtr.treants._MEMBERSHIP
+        assert subsub.filepath in cache
+        os.remove(subsub.filepath)
+        with pytest.raises(OSError):
+            subsub.contains_deep(t1)
+        assert subsub.filepath not in cache
+
+        monkeypatch.setattr(cache, 'maxsize', 1)
+        treant.contains_deep(t1)
+        assert list(cache) == [treant.filepath]
+
     class TestMembers(test_collections.TestBundle):
         """Test member functionality"""
 
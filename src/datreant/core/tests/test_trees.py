@@ -221,6 +221,175 @@ class TestTree(TestVeg):
         assert tl in tree.glob('*r*y')
         assert tc in tree.glob('*r*y')
 
+    def test_hashes(self, tree):
+        import hashlib
+        import json
+
+        tree['moe'].write('larry')
+        tree['curly/shemp'].write(b'joe')
+        tree['.hidden'].write('curly joe')
+
+        hashes = tree.hashes()
+        assert hashes == {
+            'moe': hashlib.sha256(b'larry').hexdigest(),
+            os.path.join('curly', 'shemp'): hashlib.sha256(b'joe').hexdigest()}
+        assert tree.hashes(processes=2) == hashes
+        assert '.hidden' in tree.hashes(hidden=True)
+
+        # unchanged files are not read again; cached digests are used
+        cachefile = os.path.join(tree.abspath, '.hashes.json')
+        with open(cachefile) as f:
+            cache = json.load(f)
+        cache['sha256']['moe'][3] = 'cached'
+        with open(cachefile, 'w') as f:
+            json.dump(cache, f)
+
+        assert tree.hashes()['moe'] == 'cached'
+
+        # changed files are
+        tree['moe'].write('curly')
+        assert tree.hashes()['moe'] == hashlib.sha256(b'curly').hexdigest()
+
+        # entries for files that are gone are dropped
+        os.remove(tree['moe'].abspath)
+        assert 'moe' not in tree.hashes()
+        with open(cachefile) as f:
+            assert 'moe' not in json.load(f)['sha256']
+
+        assert tree.hashes('md5') == {
+            os.path.join('curly', 'shemp'): hashlib.md5(b'joe').hexdigest()}
+
+    def test_diff(self, tree, tmpdir):
+        tree['moe'].write('larry')
+        tree['curly/shemp'].write('joe')
+        tree['curly/joe'].write('besser')
+
+        other = Tree(str(tmpdir.join('copy')))
+        other['moe'].write('larry')
+        other['curly/shemp'].write('joes')
+        other['curly/joe'].write('derita')
+        other['stooges'].write('three')
+
+        diff = tree.diff(other)
+        assert diff.added == ['stooges']
+        assert diff.removed == []
+        # differing sizes and differing contents
+        assert diff.modified == [os.path.join('curly', 'joe'),
+                                 os.path.join('curly', 'shemp')]
+
+        # same size and mtime is taken as unchanged, without reading files
+        st = os.stat(tree['curly/joe'].abspath)
+        os.utime(other['curly/joe'].abspath, (st.st_atime, st.st_mtime))
+        assert tree.diff(other).modified == [os.path.join('curly', 'shemp')]
+
+        # same contents but different mtime is unchanged
+        other['curly/joe'].write('besser')
+        os.utime(other['curly/joe'].abspath, (0, 0))
+        assert tree.diff(other).modified == [os.path.join('curly', 'shemp')]
+
+        diff = other.diff(tree.abspath)
+        assert diff.added == []
+        assert diff.removed == ['stooges']
+
+        assert tree.diff(tmpdir.join('nothing')).removed == sorted(
+            tree.hashes())
+
+    def test_copy_sync(self, tree, tmpdir):
+        tree['moe'].write('larry')
+        tree['curly/shemp'].write('joe')
+        tree['.hidden/curly'].write('joe')
+        tree['empty/'].make()
+
+        for processes in (1, 2):
+            dest = tree.copy(tmpdir.join('copy{}'.format(processes)).strpath,
+                             processes=processes)
+
+            assert isinstance(dest, Tree)
+            assert dest['curly/shemp'].read() == 'joe'
+            assert dest['.hidden/curly'].read() == 'joe'
+            assert dest['empty/'].exists
+            assert tree.diff(dest, hidden=True) == ([], [], [])
+
+        # up-to-date files are not copied again
+        inode = os.stat(dest['moe'].abspath).st_ino
+        dest['extra'].write('besser')
+        tree['curly/shemp'].write('joe besser')
+
+        tree.copy(dest)
+        assert os.stat(dest['moe'].abspath).st_ino == inode
+        assert dest['curly/shemp'].read() == 'joe besser'
+        assert dest['extra'].exists
+
+        # syncing keeps files not in the source, unless asked to delete them
+        dest['more/extra'].write('shemp')
+        dest['more/and/more'].write('shemp')
+        tree.sync(dest)
+        assert dest['extra'].exists
+        assert dest['more/and/more'].exists
+
+        tree.sync(dest, delete=True)
+        assert not dest['extra'].exists
+        assert not dest['more/'].exists
+        assert dest['empty/'].exists
+        assert tree.diff(dest, hidden=True) == ([], [], [])
+
+    def test_copy_dirlinks(self, tree, tmpdir):
+        tree['moe'].write('larry')
+        elsewhere = Tree(tmpdir.join('elsewhere').strpath)
+        elsewhere['shemp'].write('joe')
+        link = os.path.join(tree.abspath, 'curly')
+        os.symlink(elsewhere.abspath, link)
+
+        # symlinked directories are copied as symlinks, not empty directories
+        dest = tree.copy(tmpdir.join('copy').strpath)
+        copied = os.path.join(dest.abspath, 'curly')
+        assert os.path.islink(copied)
+        assert os.readlink(copied) == elsewhere.abspath
+        assert tree.diff(dest) == ([], [], [])
+
+        # and compared by where they point
+        os.remove(copied)
+        os.symlink(tree.abspath, copied)
+        assert tree.diff(dest).modified == ['curly']
+
+        tree.sync(dest)
+        assert os.readlink(copied) == elsewhere.abspath
+
+        os.remove(copied)
+        assert tree.diff(dest).removed == ['curly']
+
+        # a directory in place of a symlink is replaced only on delete
+        dest['curly/shemp'].write('joe')
+        tree.sync(dest)
+        assert not os.path.islink(copied)
+
+        tree.sync(dest, delete=True)
+        assert os.path.islink(copied)
+        assert tree.diff(dest) == ([], [], [])
+
+        # symlinks in the way of the source's directories are replaced
+        os.remove(link)
+        tree['curly/joe'].write('besser')
+        tree.sync(dest)
+        assert not os.path.islink(copied)
+        assert dest['curly/joe'].read() == 'besser'
+        assert elsewhere['shemp'].exists
+        assert not elsewhere['joe'].exists
+
+    def test_copy_links(self, tree, tmpdir):
+        tree['moe'].write('larry')
+
+        dest = tree.copy(tmpdir.join('hard').strpath, link='hard')
+        assert (os.stat(dest['moe'].abspath).st_ino ==
+                os.stat(tree['moe'].abspath).st_ino)
+
+        # reflinks fall back to copies where unsupported
+        dest = tree.copy(tmpdir.join('reflink').strpath, link='reflink')
+        assert dest['moe'].read() == 'larry'
+
+        with pytest.raises(ValueError):
+            tree.copy(tmpdir.join('soft').strpath, link='soft')
+
 
 class TestLeaf(TestVeg):
     """Test Leaf-specific features.
@@ -276,3 +445,87 @@ class TestLeaf(TestVeg):
 
     def test_makedirs(self, leaf):
         pass
+
+    def test_open(self, leaf):
+        leaf.makedirs()
+        with leaf.open('w') as f:
+            f.write('fault\nin our\nroots\n')
+
+        with leaf.open() as f:
+            assert f.read() == leaf.read()
+
+    def test_iter_chunks(self, leaf):
+        leaf.makedirs()
+        with leaf.open('wb') as f:
+            f.write(b'0123456789')
+
+        chunks = list(leaf.iter_chunks(chunksize=4))
+        assert chunks == [b'0123', b'4567', b'89']
+
+    def test_iter_lines(self, leaf):
+        leaf.makedirs()
+        with leaf.open('w') as f:
+            f.write('fault\nin our\nroots\n')
+
+        assert list(leaf.iter_lines()) == ['fault\n', 'in our\n', 'roots\n']
+        assert list(leaf.iter_lines('rb'))[-1] == b'roots\n'
+
+    def test_mmap(self, leaf):
+        leaf.make()
+
+        with pytest.raises(ValueError):
+            leaf.mmap()
+
+        with leaf.open('wb') as f:
+            f.write(b'0123456789')
+
+        m = leaf.mmap()
+        assert m[2:5] == b'234'
+        assert len(m) == 10
+        with pytest.raises(TypeError):
+            m[0:1] = b'1'
+        m.close()
+
+    def test_write(self, leaf):
+        leaf.write('fault\nin our\nroots\n')
+        assert leaf.read() == 'fault\nin our\nroots\n'
+
+        leaf.write(b'stars')
+        assert leaf.read() == 'stars'
+
+        # buffer is renamed into place; lock proxy stays hidden
+        assert leaf.parent.leaves == [leaf]
+
+        # rewriting keeps the file's permissions
+        os.chmod(leaf.abspath, 0o750)
+        leaf.write('fault')
+        assert os.stat(leaf.abspath).st_mode & 0o777 == 0o750
+
+        # the lock proxy is never hashed or copied
+        assert list(leaf.parent.hashes(hidden=True)) == [leaf.name]
+        copied = leaf.parent.copy(leaf.parent.parent['copied/'])
+        assert copied.hidden.memberleaves.names == []
+
+    def test_atomic_writer(self, leaf):
+        leaf.write('stars')
+
+        with pytest.raises(RuntimeError):
+            with leaf.atomic_writer() as f:
+                f.write('fault')
+                raise RuntimeError
+
+        assert leaf.read() == 'stars'
+        assert not [hidden for hidden in leaf.parent.hidden.memberleaves
+                    if hidden.name.endswith('.buffer')]
+
+        with leaf.atomic_writer('wb') as f:
+            f.write(b'fault')
+
+        assert leaf.read() == 'fault'
+
+    def test_hash(self, leaf):
+        import hashlib
+
+        leaf.write(b'stars')
+        assert leaf.hash() == hashlib.sha256(b'stars').hexdigest()
+        assert leaf.hash('md5') == hashlib.md5(b'stars').hexdigest()
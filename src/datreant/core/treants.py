@@ -3,14 +3,18 @@ Treants: the organizational units for :mod:`datreant`.
 
 """
 import os
+import errno
+import shutil
 import functools
 import six
+from collections import deque
 from uuid import uuid4
+from weakref import WeakValueDictionary
 from pathlib import Path
 
 from . import limbs
 from . import filesystem
-from .collections import Bundle
+from .collections import Bundle, TreantHandle, MemberCache
 from .trees import Tree
 from .util import makedirs
 
@@ -26,6 +30,173 @@ class NoTreantsError(Exception):
     pass
 
 
+# live Treants by absolute statefile path, if enabled; see `identity_map`
+_IDENTITY_MAP = None
+
+
+def identity_map(enabled=True):
+    """Share one Treant instance per state file within this process.
+
+    With the identity map enabled, creating a Treant for a state file that
+    already has a live Treant of the same class gives back that instance,
+    with its backend and limbs, instead of a new one. This holds for Treants
+    made directly as well as those made by Bundles, Groups and
+    :func:`~datreant.core.discover`. Instances are held by weak reference
+    only, so the map never keeps a Treant alive.
+
+    Parameters
+    ----------
+    enabled : bool
+        If ``True``, enable the identity map; if ``False``, disable it and
+        forget all registered Treants.
+
+    """
+    global _IDENTITY_MAP
+    if enabled:
+        if _IDENTITY_MAP is None:
+            _IDENTITY_MAP = WeakValueDictionary()
+    else:
+        _IDENTITY_MAP = None
+
+
+def _register(treant):
+    """Add a Treant to the identity map, if enabled.
+
+    """
+    if _IDENTITY_MAP is not None:
+        _IDENTITY_MAP[os.path.abspath(treant.filepath)] = treant
+
+
+# most Groups whose member records are kept for membership queries
+MEMBERSHIP_CACHESIZE = 4096
+
+# member records of Groups by absolute statefile path, each with the version
+# of the statefile they were read from, least recently used evicted first;
+# see `_group_members`
+_MEMBERSHIP = MemberCache(MEMBERSHIP_CACHESIZE)
+
+
+def _statefile_version(statefile):
+    """Version of a state file, changed by any write to it.
+
+    State files are replaced on write, so the inode changes even when size
+    and mtime happen not to.
+
+    """
+    st = os.stat(statefile)
+    return (st.st_ino, st.st_size, getattr(st, 'st_mtime_ns', st.st_mtime))
+
+
+def _group_members(statefile):
+    """Get member records of the Group with the given state file.
+
+    The state file is read only if it changed since it was last read;
+    otherwise the cached records are given. Records for a state file that
+    no longer exists are dropped.
+
+    """
+    try:
+        version = _statefile_version(statefile)
+    except OSError:
+        _MEMBERSHIP.pop(statefile, None)
+        raise
+
+    cached = _MEMBERSHIP.get(statefile)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+
+    with treantfile(statefile).read() as state:
+        members = list(state.get('members', []))
+
+    _MEMBERSHIP[statefile] = (version, members)
+    return members
+
+
+def _member_statefile(parent, member):
+    """Get the state file of a member Group, or ``None`` if it can't be found.
+
+    Looks at the member's recorded absolute and relative paths first, and
+    falls back to searching for it from the parent Group.
+
+    """
+    filename = filesystem.statefilename(member['treanttype'], member['uuid'])
+    candidates = [member['abspath']]
+    if 'relpath' in member:
+        candidates.append(os.path.join(os.path.dirname(parent),
+                                       member['relpath']))
+
+    for directory in candidates:
+        statefile = os.path.abspath(os.path.join(directory, filename))
+        if os.path.exists(statefile):
+            return statefile
+
+    parenttype = os.path.basename(parent).split('.')[0]
+    try:
+        members = _TREANTS[parenttype](parent).members
+        return os.path.abspath(members._fetch([member])[0].filepath)
+    except IOError:
+        return None
+
+
+def _memberships(roots):
+    """Walk the Group hierarchy below the given Group state files.
+
+    Groups are visited breadth-first, and each only once, so cycles are safe.
+
+    Yields
+    ------
+    (statefile, member)
+        Absolute path to a Group's state file, and the record of one of its
+        members.
+
+    """
+    roots = [os.path.abspath(root) for root in roots]
+    visited = set(roots)
+    queue = deque(roots)
+
+    while queue:
+        statefile = queue.popleft()
+        for member in _group_members(statefile):
+            yield statefile, member
+
+            if hasattr(_TREANTS.get(member['treanttype']), 'members'):
+                substatefile = _member_statefile(statefile, member)
+                if substatefile is not None and substatefile not in visited:
+                    visited.add(substatefile)
+                    queue.append(substatefile)
+
+
+def _statefile_bundle(statefiles):
+    """Build a Bundle of Treants from their state files, without loading them.
+
+    """
+    bundle = Bundle()
+    uuids, treanttypes, abspaths = [], [], []
+    for statefile in statefiles:
+        treanttype, uuid = os.path.basename(statefile).split('.')[:2]
+        uuids.append(uuid)
+        treanttypes.append(treanttype)
+        abspaths.append(os.path.dirname(statefile))
+    bundle._add_members(uuids, treanttypes, abspaths)
+    return bundle
+
+
+def _root_statefiles(root):
+    """State files of the Groups to start a membership walk from.
+
+    """
+    if isinstance(root, Bundle):
+        return [os.path.join(member['abspath'],
+                             filesystem.statefilename(member['treanttype'],
+                                                      member['uuid']))
+                for member in root._get_member_records()
+                if hasattr(_TREANTS.get(member['treanttype']), 'members')]
+    elif hasattr(root, 'members'):
+        return [root.filepath]
+    else:
+        raise TypeError("Root must be a Group or a Bundle")
+
+
 class _Treantmeta(type):
     def __init__(cls, name, bases, classdict):
         type.__init__(type, name, bases, classdict)
@@ -33,6 +204,40 @@ class _Treantmeta(type):
         treanttype = classdict['_treanttype']
         _TREANTS[treanttype] = cls
 
+    def __call__(cls, *args, **kwargs):
+        # without the identity map, make a Treant as the class would
+        if _IDENTITY_MAP is None:
+            return type.__call__(cls, *args, **kwargs)
+
+        # only a lone path, perhaps with metadata, can name an existing
+        # Treant; subclasses may name and add arguments as they like
+        if (len(args) != 1 or kwargs.get('new') or
+                not isinstance(args[0], (six.string_types, Tree)) or
+                set(kwargs) - {'new', 'categories', 'tags'}):
+            return type.__call__(cls, *args, **kwargs)
+        treant = args[0]
+
+        path = treant.abspath if isinstance(treant, Tree) else treant
+        if os.path.isdir(path):
+            statefile = filesystem.glob_treant(path)
+            statefile = statefile[0] if len(statefile) == 1 else None
+        else:
+            statefile = path
+
+        existing = None
+        if statefile is not None:
+            statefile = os.path.abspath(statefile)
+            existing = _IDENTITY_MAP.get(statefile)
+
+        # a registered Treant may have moved since
+        if (existing is None or type(existing) is not cls or
+                os.path.abspath(existing.filepath) != statefile):
+            return type.__call__(cls, *args, **kwargs)
+
+        existing._add_metadata(categories=kwargs.get('categories'),
+                               tags=kwargs.get('tags'))
+        return existing
+
 
 @functools.total_ordering
 class Treant(six.with_metaclass(_Treantmeta, Tree)):
@@ -120,7 +325,8 @@ class Treant(six.with_metaclass(_Treantmeta, Tree)):
         return self.filepath
 
     def __setstate__(self, state):
-        self.__init__(state)
+        # the state file is trusted as-is; no I/O until the Treant is used
+        self._backend = treantfile(state)
 
     def __hash__(self):
         return hash(self.uuid)
@@ -141,7 +347,7 @@ class Treant(six.with_metaclass(_Treantmeta, Tree)):
         """Addition of treants with collections or treants yields Bundle.
 
         """
-        if isinstance(b, (Treant, Bundle)):
+        if isinstance(b, (Treant, TreantHandle, Bundle)):
             return Bundle(a, b)
         else:
             raise TypeError("Operands must be Treants or Bundles.")
@@ -178,6 +384,8 @@ class Treant(six.with_metaclass(_Treantmeta, Tree)):
             self.categories.add(categories)
             self.tags.add(tags)
 
+        _register(self)
+
     def _regenerate(self, treant, categories=None, tags=None):
         """Re-generate existing Treant object.
 
@@ -189,18 +397,7 @@ class Treant(six.with_metaclass(_Treantmeta, Tree)):
 
             # if only one state file, load it; otherwise, complain loudly
             if len(statefile) == 1:
-                self._backend = treantfile(statefile[0])
-                # try to add categories, tags in one go
-                if categories or tags:
-                    try:
-                        with self._write:
-                            if categories:
-                                self.categories.add(categories)
-                            if tags:
-                                self.tags.add(tags)
-                    except (OSError, IOError):
-                        pass
-
+                statefile = statefile[0]
             elif len(statefile) == 0:
                 raise NoTreantsError('No Treants found in directory.')
             else:
@@ -210,21 +407,29 @@ class Treant(six.with_metaclass(_Treantmeta, Tree)):
 
         # if a state file is given, try loading it
         elif os.path.exists(treant):
-            self._backend = treantfile(treant)
-            # try to add categories, tags
-            if categories or tags:
-                # try to add categories, tags in one go
-                try:
-                    with self._write:
-                        if categories:
-                            self.categories.add(categories)
-                        if tags:
-                            self.tags.add(tags)
-                except (OSError, IOError):
-                    pass
+            statefile = treant
         else:
             raise NoTreantsError('No Treants found in path.')
 
+        self._backend = treantfile(statefile)
+        self._add_metadata(categories=categories, tags=tags)
+
+        _register(self)
+
+    def _add_metadata(self, categories=None, tags=None):
+        """Add categories, tags in one go, if possible.
+
+        """
+        if categories or tags:
+            try:
+                with self._write:
+                    if categories:
+                        self.categories.add(categories)
+                    if tags:
+                        self.tags.add(tags)
+            except (OSError, IOError):
+                pass
+
     @property
     def name(self):
         """The name of the Treant.
@@ -301,7 +506,8 @@ class Treant(six.with_metaclass(_Treantmeta, Tree)):
 
         Physically moves the Treant to the given location.
         Only works if the new location is an empty or nonexistent
-        directory.
+        directory. Moves across filesystems are done by copying, with
+        symlinks kept as they are, then removing the original.
 
         """
         makedirs(value)
@@ -310,7 +516,17 @@ class Treant(six.with_metaclass(_Treantmeta, Tree)):
         statefile = os.path.join(newpath,
                                  filesystem.statefilename(
                                      self._treanttype, self.uuid))
-        os.rename(oldpath, newpath)
+        try:
+            os.rename(oldpath, newpath)
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+
+            # copies symlinks as symlinks, and only then removes the original
+            if os.path.isdir(newpath):
+                os.rmdir(newpath)
+            shutil.move(oldpath, newpath)
+
         self._regenerate(statefile)
 
     @property
@@ -340,6 +556,45 @@ class Treant(six.with_metaclass(_Treantmeta, Tree)):
             state = self._state
         return state
 
+    def groups_containing(self, root):
+        """Get all Groups in a Group hierarchy that contain this Treant,
+        directly or through member Groups.
+
+        Each Group in the hierarchy is read only if its state file changed
+        since it was last read in this process.
+
+        Parameters
+        ----------
+        root : Group or Bundle
+            Group, or Bundle of Groups, whose hierarchy to search; these are
+            included in the result if they contain this Treant.
+
+        Returns
+        -------
+        Bundle
+            Groups containing this Treant, nearest first.
+
+        """
+        roots = _root_statefiles(root)
+
+        # who contains whom, from a single walk down the hierarchy
+        parents = dict()
+        for statefile, member in _memberships(roots):
+            parents.setdefault(member['uuid'], []).append(statefile)
+
+        # then walk back up from this Treant
+        ancestors = list()
+        seen = set()
+        queue = deque([self.uuid])
+        while queue:
+            for statefile in parents.get(queue.popleft(), ()):
+                if statefile not in seen:
+                    seen.add(statefile)
+                    ancestors.append(statefile)
+                    queue.append(os.path.basename(statefile).split('.')[1])
+
+        return _statefile_bundle(ancestors)
+
 
 class Group(Treant):
     """A Treant with a persistent Bundle of other Treants.
@@ -391,3 +646,52 @@ class Group(Treant):
         out = out + ">"
 
         return out
+
+    def contains_deep(self, treant):
+        """Check if a Treant is a member of this Group, or of any Group below
+        it.
+
+        Groups below this one are read only if their state files changed
+        since they were last read in this process, and the search stops as
+        soon as the Treant is found.
+
+        Parameters
+        ----------
+        treant : Treant or str
+            Treant, or uuid of a Treant, to look for.
+
+        Returns
+        -------
+        bool
+            ``True`` if the Treant is found in this Group's hierarchy.
+
+        """
+        uuid = treant if isinstance(treant, six.string_types) else treant.uuid
+        return any(member['uuid'] == uuid
+                   for _, member in _memberships([self.filepath]))
+
+    def descendants(self):
+        """Get all Treants in this Group's hierarchy.
+
+        This includes members of this Group, and the members of any Group
+        below it, Groups among them. Groups are read only if their state files
+        changed since they were last read in this process.
+
+        Returns
+        -------
+        Bundle
+            All Treants below this Group, breadth-first.
+
+        """
+        uuids, treanttypes, abspaths = [], [], []
+        seen = set([self.uuid])
+        for _, member in _memberships([self.filepath]):
+            if member['uuid'] not in seen:
+                seen.add(member['uuid'])
+                uuids.append(member['uuid'])
+                treanttypes.append(member['treanttype'])
+                abspaths.append(member['abspath'])
+
+        bundle = Bundle()
+        bundle._add_members(uuids, treanttypes, abspaths)
+        return bundle
@@ -4,17 +4,145 @@ files.
 """
 
 import os
+import mmap
+import fcntl
+import shutil
+import hashlib
+import functools
+import multiprocessing as mp
+from multiprocessing.pool import ThreadPool
+from collections import namedtuple
 from functools import reduce, total_ordering
-from six import string_types
+from six import string_types, binary_type
 
 import scandir
 from pathlib import Path
 from asciitree import LeftAligned
 
 from .util import makedirs
+from .backends import FileAtomic
+from .backends.statefiles import HashCacheFile
 from .manipulators import discover
 from . import _TREELIMBS
 
+# default size of chunks, in bytes, used when streaming file contents
+CHUNKSIZE = 1024 * 1024
+
+# name of the hidden file each Tree uses to cache content digests
+HASHCACHE = '.hashes.json'
+
+# files belonging to the digest cache itself, never included in hashing
+_HASHCACHEFILES = (HASHCACHE,
+                   ".{}.proxy".format(HASHCACHE),
+                   ".{}.buffer".format(HASHCACHE))
+
+# suffixes of the hidden lock proxy and write buffer files kept beside files
+# written through a backend; these are never hashed or copied
+_BACKENDSUFFIXES = ('.proxy', '.buffer')
+
+
+TreeDiff = namedtuple('TreeDiff', ['added', 'removed', 'modified'])
+
+
+def _hiddenpath(relpath):
+    """Return True if any component of the relative path is hidden.
+
+    """
+    return any(part[0] == os.extsep for part in relpath.split(os.sep))
+
+
+# ioctl request for cloning a file's extents (Linux FICLONE)
+_FICLONE = 0x40049409
+
+
+def _reflink(source, dest):
+    """Make `dest` a copy-on-write clone of `source`, if the filesystem
+    supports it.
+
+    Returns True on success; otherwise no file is left at `dest`.
+
+    """
+    try:
+        with open(source, 'rb') as src:
+            with open(dest, 'wb') as dst:
+                fcntl.ioctl(dst.fileno(), _FICLONE, src.fileno())
+    except (IOError, OSError):
+        if os.path.exists(dest):
+            os.remove(dest)
+        return False
+
+    shutil.copystat(source, dest)
+    return True
+
+
+def _transfer(job):
+    """Copy a file, or link it if requested and possible.
+
+    Parameters
+    ----------
+    job : tuple
+        Source path, destination path, and link type; link type is one of
+        ``None``, 'hard', or 'reflink'. Copies fall back to plain copies when
+        a link can't be made.
+
+    """
+    source, dest, link = job
+
+    # remove first, so we never write through an existing hardlink
+    if os.path.lexists(dest):
+        os.remove(dest)
+
+    if link == 'hard':
+        try:
+            os.link(source, dest)
+            return
+        except OSError:
+            pass
+    elif link == 'reflink':
+        if _reflink(source, dest):
+            return
+
+    shutil.copy2(source, dest)
+
+
+def _transfer_all(jobs, processes=1):
+    """Perform file transfers given by :func:`_transfer` jobs, perhaps in
+    parallel.
+
+    """
+    if processes > 1 and len(jobs) > 1:
+        pool = mp.Pool(processes=processes)
+        pool.map(_transfer, jobs)
+        pool.close()
+        pool.join()
+    else:
+        for job in jobs:
+            _transfer(job)
+
+
+def _digest(path, algorithm='sha256'):
+    """Return the hex digest of the file at `path`.
+
+    """
+    return Leaf(path).hash(algorithm)
+
+
+def _digest_all(paths, algorithm='sha256', processes=1):
+    """Return hex digests for the files at `paths`, in order, perhaps
+    computing them in parallel.
+
+    """
+    if processes > 1 and len(paths) > 1:
+        pool = mp.Pool(processes=processes)
+        digests = pool.map(functools.partial(_digest, algorithm=algorithm),
+                           paths)
+        pool.close()
+        pool.join()
+    else:
+        digests = [_digest(path, algorithm) for path in paths]
+
+    return digests
+
 
 @total_ordering
 class Veg(object):
@@ -147,6 +275,147 @@ class Leaf(Veg):
                 out = f.read()
         return out
 
+    def open(self, mode='r'):
+        """Open the file, returning a file object.
+
+        The file object can be used as a context manager, so that it is closed
+        when the block is exited.
+
+        Parameters
+        ----------
+        mode : str
+            Mode in which the file is opened; see :func:`open` for options.
+
+        Returns
+        -------
+        file
+            The opened file.
+
+        """
+        return open(self.abspath, mode)
+
+    def iter_chunks(self, chunksize=CHUNKSIZE):
+        """Iterate through the file's contents in chunks of bytes.
+
+        Only one chunk is held in memory at a time, making this suitable for
+        scanning through files too large to read all at once.
+
+        Parameters
+        ----------
+        chunksize : int
+            Maximum size of each chunk, in bytes.
+
+        Yields
+        ------
+        bytes
+            Successive chunks of the file.
+
+        """
+        with open(self.abspath, 'rb') as f:
+            for chunk in iter(functools.partial(f.read, chunksize), b''):
+                yield chunk
+
+    def iter_lines(self, mode='r'):
+        """Iterate through the lines of the file.
+
+        Lines are read one at a time, and include their line terminators.
+
+        Parameters
+        ----------
+        mode : {'r', 'rb'}
+            Whether to yield lines as text or as bytes.
+
+        Yields
+        ------
+        str or bytes
+            Successive lines of the file.
+
+        """
+        with open(self.abspath, mode) as f:
+            for line in f:
+                yield line
+
+    def mmap(self):
+        """Memory-map the file read-only.
+
+        The returned :class:`mmap.mmap` can be sliced to read parts of the
+        file without reading the whole file into memory. The map should be
+        closed with its ``close`` method when no longer needed.
+
+        Empty files cannot be memory-mapped.
+
+        Returns
+        -------
+        mmap.mmap
+            Read-only memory map of the file.
+
+        """
+        with open(self.abspath, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                raise ValueError("Cannot memory-map an empty file")
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def hash(self, algorithm='sha256'):
+        """Compute a digest of the file's contents.
+
+        The file is read in chunks, so files of any size can be hashed.
+
+        Parameters
+        ----------
+        algorithm : str
+            Name of any hashing algorithm supported by :mod:`hashlib`.
+
+        Returns
+        -------
+        str
+            Hex digest of the file's contents.
+
+        """
+        digest = hashlib.new(algorithm)
+        for chunk in self.iter_chunks():
+            digest.update(chunk)
+
+        return digest.hexdigest()
+
+    def atomic_writer(self, mode='w'):
+        """Context manager giving a file object that atomically replaces this
+        file's contents.
+
+        Written contents go to a hidden buffer file under an exclusive lock,
+        which is renamed over this file when the block exits. If the block
+        raises an exception, the file is left untouched. Directories along
+        the path are created if they don't exist.
+
+        Parameters
+        ----------
+        mode : {'w', 'wb'}
+            Whether the file object takes text or bytes.
+
+        """
+        self.makedirs()
+        return FileAtomic(self.abspath).write(mode)
+
+    def write(self, data):
+        """Atomically replace the file's contents with `data`.
+
+        Parameters
+        ----------
+        data : str or bytes
+            Contents to write.
+
+        Returns
+        -------
+        Leaf
+            This Leaf.
+
+        """
+        mode = 'wb' if isinstance(data, binary_type) else 'w'
+
+        with self.atomic_writer(mode) as f:
+            f.write(data)
+
+        return self
+
 
 class Tree(Veg):
     """A directory.
@@ -394,6 +663,438 @@ class Tree(Veg):
 
         return View(out)
 
+    def _stat_files(self, hidden=False, subdirs=None, dirlinks=None):
+        """Stat all files within this Tree, recursively.
+
+        Files belonging to the digest cache, and the lock proxy and write
+        buffer files of backends, are never included. Symlinks to
+        directories are not followed.
+
+        Parameters
+        ----------
+        hidden : bool
+            If False, leave out hidden files and the contents of hidden
+            directories.
+        subdirs : list
+            If given, the paths of all directories walked, relative to this
+            Tree, are appended to it.
+        dirlinks : dict
+            If given, filled with the paths of symlinks to directories,
+            relative to this Tree, as keys and their targets as values.
+
+        Returns
+        -------
+        dict
+            Paths of files relative to this Tree as keys; tuples giving the
+            absolute path to each file and its (inode, size, modification
+            time) as values.
+
+        """
+        out = dict()
+        root = self.abspath
+        for dirpath, dirs, files in scandir.walk(root):
+            if not hidden:
+                dirs[:] = [d for d in dirs if d[0] != os.extsep]
+                files = [f for f in files if f[0] != os.extsep]
+
+            # symlinked directories aren't walked into, so keep them apart
+            links = [d for d in dirs
+                     if os.path.islink(os.path.join(dirpath, d))]
+            if links:
+                dirs[:] = [d for d in dirs if d not in links]
+                if dirlinks is not None:
+                    for d in links:
+                        path = os.path.join(dirpath, d)
+                        dirlinks[os.path.relpath(path, root)] = \
+                            os.readlink(path)
+
+            if subdirs is not None:
+                subdirs.extend(os.path.relpath(os.path.join(dirpath, d), root)
+                               for d in dirs)
+
+            for f in files:
+                if f in _HASHCACHEFILES or (f[0] == os.extsep and
+                                            f.endswith(_BACKENDSUFFIXES)):
+                    continue
+
+                path = os.path.join(dirpath, f)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    # broken symlink, or removed while walking
+                    continue
+
+                out[os.path.relpath(path, root)] = (
+                        path, (st.st_ino, st.st_size, st.st_mtime))
+
+        return out
+
+    def _hashplan(self, algorithm, stats, hidden=None):
+        """Split files into those with valid cached digests and those that
+        must be hashed.
+
+        Parameters
+        ----------
+        algorithm : str
+            Name of hashing algorithm.
+        stats : dict
+            Files to consider, as given by :meth:`_stat_files`.
+        hidden : bool
+            If ``None``, `stats` may be any subset of the files in this Tree.
+            Otherwise, `stats` must be all files in this Tree, including
+            hidden files only if `hidden` is True; cache entries for files
+            that no longer exist are then also identified.
+
+        Returns
+        -------
+        digests : dict
+            Relative paths as keys and cached digests as values.
+        stale : list
+            Tuples of relative path, absolute path, and (inode, size,
+            modification time) for files with no valid cached digest.
+        orphans : list
+            Relative paths of cache entries for files that no longer exist.
+
+        """
+        try:
+            with HashCacheFile(os.path.join(self.abspath, HASHCACHE)).read() \
+                    as state:
+                cached = state.get(algorithm, dict())
+        except (IOError, OSError):
+            cached = dict()
+
+        digests = dict()
+        stale = list()
+        for relpath, (abspath, key) in stats.items():
+            entry = cached.get(relpath)
+            if entry and entry[:3] == list(key):
+                digests[relpath] = entry[3]
+            else:
+                stale.append((relpath, abspath, key))
+
+        orphans = list()
+        if hidden is not None:
+            orphans = [relpath for relpath in cached
+                       if relpath not in stats and
+                       (hidden or not _hiddenpath(relpath))]
+
+        return digests, stale, orphans
+
+    def _hashstore(self, algorithm, stale, digests, orphans=()):
+        """Record newly computed digests in the digest cache.
+
+        Nothing is stored if the cache can't be written, as for a read-only
+        Tree.
+
+        Parameters
+        ----------
+        algorithm : str
+            Name of hashing algorithm.
+        stale : list
+            Files that were hashed, as given by :meth:`_hashplan`.
+        digests : list
+            Digests of the files in `stale`, in the same order.
+        orphans : list
+            Relative paths of cache entries to remove.
+
+        """
+        if not (stale or orphans):
+            return
+
+        try:
+            with HashCacheFile(os.path.join(self.abspath, HASHCACHE)).write() \
+                    as state:
+                cached = state.setdefault(algorithm, dict())
+                for relpath in orphans:
+                    cached.pop(relpath, None)
+
+                for (relpath, abspath, key), digest in zip(stale, digests):
+                    cached[relpath] = list(key) + [digest]
+        except (IOError, OSError):
+            pass
+
+    def hashes(self, algorithm='sha256', processes=1, hidden=False):
+        """Compute digests of the contents of all files within this Tree.
+
+        Digests are cached in a hidden file at the top of this Tree, keyed by
+        each file's inode, size, and modification time; files that haven't
+        changed since they were last hashed are not read again.
+
+        Parameters
+        ----------
+        algorithm : str
+            Name of any hashing algorithm supported by :mod:`hashlib`.
+        processes : int
+            How many processes to use for hashing files that are not cached.
+        hidden : bool
+            If True, include hidden files and the contents of hidden
+            directories.
+
+        Returns
+        -------
+        dict
+            Paths of files relative to this Tree as keys; hex digests of their
+            contents as values.
+
+        """
+        if not self.exists:
+            raise OSError("Tree doesn't exist in the filesystem")
+
+        stats = self._stat_files(hidden=hidden)
+        digests, stale, orphans = self._hashplan(algorithm, stats,
+                                                 hidden=hidden)
+
+        computed = _digest_all([abspath for relpath, abspath, key in stale],
+                               algorithm=algorithm, processes=processes)
+        digests.update((item[0], digest)
+                       for item, digest in zip(stale, computed))
+
+        self._hashstore(algorithm, stale, computed, orphans)
+
+        return digests
+
+    def _syncplan(self, dest, link=None, hidden=True, delete=False):
+        """Determine the work needed to make `dest` match this Tree.
+
+        Directories and symlinks to directories are made as a side effect,
+        and extraneous files and directories in `dest` are removed if
+        `delete` is True.
+
+        Parameters
+        ----------
+        dest : str
+            Absolute path of destination directory.
+        link : {None, 'hard', 'reflink'}
+            Link type for transfer jobs.
+        hidden : bool
+            If False, leave out hidden files and directories.
+        delete : bool
+            If True, remove files and directories in `dest` that are not in
+            this Tree.
+
+        Returns
+        -------
+        list
+            Transfer jobs for :func:`_transfer`, for files in `dest` that
+            are missing or differ from this Tree's in size or modification
+            time.
+
+        """
+        subdirs = list()
+        theirdirs = list()
+        ourlinks = dict()
+        theirlinks = dict()
+        ours = self._stat_files(hidden=hidden, subdirs=subdirs,
+                                dirlinks=ourlinks)
+        theirs = Tree(dest)._stat_files(hidden=hidden, subdirs=theirdirs,
+                                        dirlinks=theirlinks)
+
+        if delete:
+            for relpath in set(theirs) - set(ours):
+                os.remove(theirs[relpath][0])
+
+            for relpath in set(theirlinks) - set(ourlinks):
+                os.remove(os.path.join(dest, relpath))
+
+            # shallowest first, so each extraneous tree is removed whole
+            removed = list()
+            for subdir in sorted(set(theirdirs) - set(subdirs)):
+                if any(subdir.startswith(parent + os.sep)
+                       for parent in removed):
+                    continue
+
+                shutil.rmtree(os.path.join(dest, subdir))
+                removed.append(subdir)
+
+        # symlinks in the way of our directories would have us write
+        # outside of `dest`; they are replaced
+        makedirs(dest)
+        for subdir in subdirs:
+            if subdir in theirlinks:
+                os.remove(os.path.join(dest, subdir))
+            makedirs(os.path.join(dest, subdir))
+
+        # symlinked directories are recreated as symlinks, as when a Treant
+        # is moved across devices
+        for relpath, target in ourlinks.items():
+            path = os.path.join(dest, relpath)
+            if theirlinks.get(relpath) == target:
+                continue
+            elif relpath in theirlinks:
+                os.remove(path)
+            elif os.path.lexists(path):
+                # a real directory, kept unless `delete` removed it
+                continue
+
+            os.symlink(target, path)
+
+        jobs = list()
+        for relpath, (abspath, key) in ours.items():
+            if relpath in theirs and theirs[relpath][1][1:] == key[1:]:
+                continue
+
+            jobs.append((abspath, os.path.join(dest, relpath), link))
+
+        return jobs
+
+    def sync(self, dest, processes=1, link=None, hidden=True, delete=False):
+        """Bring another directory up to date with this Tree.
+
+        Files in `dest` that already match by size and modification time are
+        left alone; the rest are copied with their modification times
+        preserved. This makes repeat syncs cheap. Symlinks to directories are
+        recreated as symlinks. Files present only in `dest` are kept unless
+        `delete` is True.
+
+        Parameters
+        ----------
+        dest : str or Tree
+            Destination directory; created if it doesn't exist.
+        processes : int
+            How many processes to use for copying files.
+        link : {None, 'hard', 'reflink'}
+            If 'hard', hardlink files instead of copying them; if 'reflink',
+            make copy-on-write clones. Either falls back to copying when the
+            filesystem doesn't support it, such as across devices.
+        hidden : bool
+            If False, leave out hidden files and directories.
+        delete : bool
+            If True, also remove files and directories in `dest` that aren't
+            in this Tree, so that it matches this Tree exactly. Take care:
+            anything else in `dest`, such as another Treant's state file, is
+            removed.
+
+        Returns
+        -------
+        Tree
+            The destination Tree.
+
+        """
+        if not self.exists:
+            raise OSError("Tree doesn't exist in the filesystem")
+
+        if link not in (None, 'hard', 'reflink'):
+            raise ValueError("link must be None, 'hard', or 'reflink'")
+
+        if isinstance(dest, Tree):
+            dest = dest.abspath
+
+        dest = Tree(dest, limbs=self.limbs)
+        jobs = self._syncplan(dest.abspath, link=link, hidden=hidden,
+                              delete=delete)
+        _transfer_all(jobs, processes=processes)
+
+        return dest
+
+    def copy(self, dest, processes=1, link=None, hidden=True):
+        """Copy the contents of this Tree to another directory.
+
+        Equivalent to :meth:`sync` with `delete` False; files present only in
+        `dest` are left in place.
+
+        Parameters
+        ----------
+        dest : str or Tree
+            Destination directory; created if it doesn't exist.
+        processes : int
+            How many processes to use for copying files.
+        link : {None, 'hard', 'reflink'}
+            If 'hard', hardlink files instead of copying them; if 'reflink',
+            make copy-on-write clones. Either falls back to copying when the
+            filesystem doesn't support it, such as across devices.
+        hidden : bool
+            If False, leave out hidden files and directories.
+
+        Returns
+        -------
+        Tree
+            The destination Tree.
+
+        """
+        return self.sync(dest, processes=processes, link=link, hidden=hidden,
+                         delete=False)
+
+    def diff(self, other, hidden=False, algorithm='sha256', processes=1):
+        """Compare the files within this Tree to those within another.
+
+        Files present in both are first compared by size and modification
+        time. Files differing in size are modified; files matching in both are
+        taken as unchanged. Only files of the same size but different
+        modification times have their contents compared, using each Tree's
+        digest cache as with :meth:`hashes`. Symlinks to directories are not
+        followed, but compared by their targets.
+
+        A Tree that doesn't exist in the filesystem is treated as empty.
+
+        Parameters
+        ----------
+        other : Tree or str
+            Tree to compare against.
+        hidden : bool
+            If True, include hidden files and the contents of hidden
+            directories.
+        algorithm : str
+            Name of hashing algorithm to compare contents with.
+        processes : int
+            How many processes to use for hashing files that are not cached.
+
+        Returns
+        -------
+        TreeDiff
+            Named tuple with fields `added`, giving files present only in
+            `other`; `removed`, giving files present only in this Tree; and
+            `modified`, giving files present in both whose contents differ.
+            Each is a sorted list of paths relative to the Trees.
+
+        """
+        if not isinstance(other, Tree):
+            other = Tree(other)
+
+        # walk both trees at once; stat calls spend their time in the kernel
+        pool = ThreadPool(processes=2)
+        ourlinks = dict()
+        theirlinks = dict()
+        ours, theirs = pool.map(
+                lambda args: args[0]._stat_files(hidden=hidden,
+                                                 dirlinks=args[1]),
+                [(self, ourlinks), (other, theirlinks)])
+        pool.close()
+        pool.join()
+
+        added = sorted(set(theirs) - set(ours) |
+                       set(theirlinks) - set(ourlinks))
+        removed = sorted(set(ours) - set(theirs) |
+                         set(ourlinks) - set(theirlinks))
+
+        modified = [relpath for relpath in set(ourlinks) & set(theirlinks)
+                    if ourlinks[relpath] != theirlinks[relpath]]
+        ambiguous = list()
+        for relpath in set(ours) & set(theirs):
+            ino, size, mtime = ours[relpath][1]
+            oino, osize, omtime = theirs[relpath][1]
+            if size != osize:
+                modified.append(relpath)
+            elif mtime != omtime:
+                ambiguous.append(relpath)
+
+        if ambiguous:
+            digests = list()
+            for tree, stats in ((self, ours), (other, theirs)):
+                stats = {relpath: stats[relpath] for relpath in ambiguous}
+                cached, stale, orphans = tree._hashplan(algorithm, stats)
+                computed = _digest_all(
+                        [abspath for relpath, abspath, key in stale],
+                        algorithm=algorithm, processes=processes)
+                tree._hashstore(algorithm, stale, computed)
+                cached.update((item[0], digest)
+                              for item, digest in zip(stale, computed))
+                digests.append(cached)
+
+            modified.extend(relpath for relpath in ambiguous
+                            if digests[0][relpath] != digests[1][relpath])
+
+        return TreeDiff(added, removed, sorted(modified))
+
     def draw(self, depth=None, hidden=False):
         """Print an ASCII-fied visual of the tree.
 